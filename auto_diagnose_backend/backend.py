@@ -1,34 +1,149 @@
-from flask import Flask, jsonify, request, send_file
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
+import atexit
 import json
-from fpdf import FPDF
-import io
+import logging
+import numpy as np
 import os
+import threading
+import time
 
-# Obtém o diretório base do script
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FONT_DIR = os.path.join(BASE_DIR, "fonts")
+from bulk_reports import entry_name, iter_zip, render_unordered
+from catalog import DEFAULT_LANGUAGE, CatalogWatcher, load_catalog
+from metrics import CONTENT_TYPE, REGISTRY, RateLimitFilter, span
+from percentiles import ScoreBenchmark
+from profiler import SamplingProfiler
+from render_pool import PoolBusy, RenderPool, ReportJobs
+from report import ReportCache, get_report_assets, prepare_report, report_cache_key, report_text
+from scoring_engine import engine_for
+from store import DEFAULT_DB_PATH, AssessmentStore, parse_timestamp
 
-# Caminhos completos das fontes
-FONT_PATH = os.path.join(FONT_DIR, "DejaVuSans.ttf")
-FONT_PATH_BOLD = os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf")
-IMAGE_DIR = os.path.join(BASE_DIR, "images")
+# Seconds between checks of questions.json for changes (0 disables hot reload)
+QUESTIONS_RELOAD_INTERVAL = float(os.environ.get("QUESTIONS_RELOAD_INTERVAL", "2"))
 
+# Rendered report cache: memory cap in bytes, and an optional directory for evicted reports with its own cap
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR") or None
+REPORT_CACHE_DIR_MAX_BYTES = int(os.environ.get("REPORT_CACHE_DIR_MAX_BYTES", str(1024 * 1024 * 1024)))
 
-app = Flask(__name__)
-CORS(app)  # Allow cross-origin requests from the frontend
+# PDF rendering pool: worker processes, reports allowed to wait, and how long the
+# synchronous endpoint waits for its report (async jobs are kept REPORT_JOB_TTL seconds)
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+REPORT_QUEUE_SIZE = int(os.environ.get("REPORT_QUEUE_SIZE", "16"))
+REPORT_TIMEOUT = float(os.environ.get("REPORT_TIMEOUT", "30"))
+REPORT_JOB_TTL = float(os.environ.get("REPORT_JOB_TTL", "600"))
+
+# Reports one bulk request keeps queued or rendering at a time, which bounds its
+# memory and leaves room in the queue for single reports
+BULK_REPORT_IN_FLIGHT = int(os.environ.get("BULK_REPORT_IN_FLIGHT", str(2 * REPORT_WORKERS)))
+
+# Size of the slices a PDF is streamed to the client in
+PDF_CHUNK_SIZE = 64 * 1024
+
+# SQLite file that keeps every submission (empty disables storage) and its connection pool size
+ASSESSMENT_DB = os.environ.get("ASSESSMENT_DB", DEFAULT_DB_PATH)
+ASSESSMENT_DB_POOL = int(os.environ.get("ASSESSMENT_DB_POOL", "4"))
+
+# Scoring sessions nobody has answered in for this many seconds are deleted
+SESSION_TTL = float(os.environ.get("SESSION_TTL", str(7 * 24 * 3600)))
 
-# Load translated questions
-with open("questions/questions.json", "r", encoding="utf-8") as f:
-    questions_data = json.load(f)
+# Repeated log messages are let through at most once per interval (seconds)
+LOG_RATE_LIMIT_INTERVAL = float(os.environ.get("LOG_RATE_LIMIT_INTERVAL", "10"))
 
-# Function to get questions by language
+# Seconds between stack samples of the built-in profiler (0 disables it)
+SAMPLING_PROFILER_INTERVAL = float(os.environ.get("SAMPLING_PROFILER_INTERVAL", "0"))
+
+logger = logging.getLogger(__name__)
+logger.addFilter(RateLimitFilter(LOG_RATE_LIMIT_INTERVAL))
+
+
+app = Flask(__name__)
+CORS(app, expose_headers=["X-Questions-Version", "X-Report-Cache"])  # Allow cross-origin requests from the frontend
+
+# Load translated questions and compile them once per language
+catalog = load_catalog()
+
+# Swap in a new compiled catalog; rebinding the global is atomic, so requests
+# already running keep the snapshot they took in before_request
+def swap_catalog(new_catalog):
+    global catalog
+    catalog = new_catalog
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES, REPORT_CACHE_DIR, REPORT_CACHE_DIR_MAX_BYTES)
+render_pool = RenderPool(REPORT_WORKERS, REPORT_QUEUE_SIZE)
+report_jobs = ReportJobs(REPORT_JOB_TTL)
+assessment_store = AssessmentStore(ASSESSMENT_DB, ASSESSMENT_DB_POOL) if ASSESSMENT_DB else None
+score_benchmark = ScoreBenchmark(assessment_store) if assessment_store is not None else None
+# Category rows stored before they carried their key are keyed by their name
+if assessment_store is not None:
+    assessment_store.backfill_category_keys(catalog.language(DEFAULT_LANGUAGE).category_keys)
+atexit.register(render_pool.shutdown, wait=False)
+
+catalog_watcher = CatalogWatcher(swap_catalog, interval=QUESTIONS_RELOAD_INTERVAL, languages=catalog.languages)
+profiler = SamplingProfiler(SAMPLING_PROFILER_INTERVAL) if SAMPLING_PROFILER_INTERVAL > 0 else None
+
+# Hot reload and profiler threads; serve.py stops them before forking workers
+# and starts them again in each worker
+def start_background_threads():
+    if QUESTIONS_RELOAD_INTERVAL > 0:
+        catalog_watcher.start()
+    if profiler is not None:
+        profiler.start()
+
+def stop_background_threads():
+    catalog_watcher.stop(wait=True)
+    if profiler is not None:
+        profiler.stop(wait=True)
+
+start_background_threads()
+
+# Set once fonts, images and covers are loaded, and once the process starts draining
+ready = threading.Event()
+draining = threading.Event()
+
+# Request metrics, plus gauges read from the caches and queues when /metrics is scraped
+REQUEST_SECONDS = REGISTRY.histogram(
+    "auto_diagnose_http_request_duration_seconds", "Time to build each response.", ["method", "endpoint", "status"]
+)
+WEAK_CATEGORIES = REGISTRY.counter(
+    "auto_diagnose_report_weak_categories", "Weak categories in the requested reports.", ["lang", "category"]
+)
+REGISTRY.gauge("auto_diagnose_report_cache_hit_ratio", "Share of report cache lookups served from the cache.",
+               lambda: report_cache.stats()["hit_ratio"])
+REGISTRY.counter_func("auto_diagnose_report_cache_lookups", "Report cache lookups by result.",
+                      lambda: [({"result": result}, report_cache.stats()[result]) for result in ("hits", "disk_hits", "misses")])
+REGISTRY.gauge("auto_diagnose_report_cache_bytes", "Bytes of rendered reports held in memory.",
+               lambda: report_cache.stats()["bytes"])
+REGISTRY.gauge("auto_diagnose_report_cache_entries", "Rendered reports held in memory.",
+               lambda: report_cache.stats()["entries"])
+REGISTRY.gauge("auto_diagnose_render_in_flight", "Reports rendering or waiting for a render worker.",
+               lambda: render_pool.stats()["in_flight"])
+REGISTRY.gauge("auto_diagnose_render_capacity", "Reports the render pool accepts before answering 429.",
+               lambda: render_pool.stats()["capacity"])
+REGISTRY.gauge("auto_diagnose_report_jobs", "Asynchronous report jobs being tracked.", lambda: len(report_jobs))
+REGISTRY.gauge("auto_diagnose_questions_version_info", "Version of the question bank being served.",
+               lambda: [({"version": catalog.version}, 1)])
+
+# Every request works against the catalog version that was current when it started
+@app.before_request
+def snapshot_catalog():
+    g.catalog = catalog
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def add_catalog_version(response):
+    response.headers["X-Questions-Version"] = g.get("catalog", catalog).version
+    if "request_started" in g:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                                method=request.method, endpoint=endpoint, status=response.status_code)
+    return response
+
+# Questions of a language, as the read-only mappings shared by every request
 def get_questions_by_language(lang):
-    if lang not in ["en", "pt"]:
-        lang = "en"  # Default to English if unsupported language is requested
-    return [{**q, "category": q["category"][lang], "text": q["text"][lang],
-             "options": [{"text": opt["text"][lang], "score": opt["score"], "recommendation": opt["recommendation"][lang]} for opt in q["options"]]}
-            for q in questions_data]
+    return list(catalog.language(lang).questions)
 
 # Function to generate recommendations based on category scores
 def generate_recommendations(category_scores, category_max_scores, lang="en"):
@@ -37,282 +152,717 @@ def generate_recommendations(category_scores, category_max_scores, lang="en"):
         if (score / category_max_scores[category]) < 0.5
     ]
 
+    return recommendation_message(weak_categories, lang), weak_categories
+
+# Summary sentence for a list of weak categories
+def recommendation_message(weak_categories, lang="en"):
+    text = report_text(lang)
     if weak_categories:
-        return (f"Foque-se em fortalecer as seguintes áreas: {', '.join(weak_categories)}." if lang == "pt" 
-                else f"Focus on strengthening key areas: {', '.join(weak_categories)}."), weak_categories
-    return ("Bom trabalho! Nenhuma fraqueza detectada." if lang == "pt" else "Good job! No major weaknesses detected."), []
+        return text["weak_areas"].format(categories=", ".join(weak_categories))
+    return text["no_weak_areas"]
+
+# Serve a pre-encoded payload, honouring Accept-Encoding and If-None-Match
+def payload_response(payload):
+    available = [e for e in ("br", "gzip", "identity") if e in payload.variants]
+    encoding = request.accept_encodings.best_match(available, default="identity")
+
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    etag = payload.etag_for(encoding)
+
+    # Any encoding of the same content is still fresh for the client
+    if any(request.if_none_match.contains_weak(payload.etag_for(e)) for e in payload.variants) or request.if_none_match.star_tag:
+        response = Response(status=304, headers=headers)
+    else:
+        response = Response(payload.variants[encoding], mimetype="application/json", headers=headers)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    return response
 
 # Endpoint to fetch questions (supports language selection)
 @app.route("/api/questions", methods=["GET"])
 def get_questions():
     lang = request.args.get("lang", "en")  # Default to English if not specified
-    return jsonify(get_questions_by_language(lang))
-
-# Endpoint to process answers and calculate score (supports language selection)
-@app.route("/api/submit", methods=["POST"])
-def submit_answers():
-    data = request.json
-    lang = request.args.get("lang", "en")  # Get language from request
-
-    if not data or "answers" not in data:
-        return jsonify({"error": "Invalid input"}), 400
-
-    questions = get_questions_by_language(lang)
-    answers = data["answers"]
-
-    if len(answers) != len(questions):
-        return jsonify({"error": "Incomplete answers"}), 400
-
-    total_score = 0
-    category_scores = {}
-    category_max_scores = {}
-    max_score = 0
-
-    # Calculate total score, category scores, and max score
-    for i, user_answer in enumerate(answers):
-        question = questions[i]
-        category = question["category"]
-
-        # Initialize category scores
-        if category not in category_scores:
-            category_scores[category] = 0
-            category_max_scores[category] = 0
-
-        max_question_score = max(option["score"] for option in question["options"])
-        category_max_scores[category] += max_question_score
-        max_score += max_question_score
+    fields = request.args.get("fields", "full")
+    category = request.args.get("category")
+    with span("catalog_lookup"):
+        questions = g.catalog.language(lang)
+        if fields not in questions.payloads:
+            return jsonify({"error": "fields must be 'full' or 'compact'"}), 400
+        if category is None:
+            payload = questions.payloads[fields]
+        else:
+            # A category by its key or by its name in any language
+            payload = questions.category_payloads[fields].get(questions.category_keys.get(category))
+            if payload is None:
+                return jsonify({"error": "Unknown category"}), 404
+    return payload_response(payload)
+
+# Endpoint listing the questionnaire sections, to fetch them one at a time with ?category=
+@app.route("/api/questions/categories", methods=["GET"])
+def get_question_categories():
+    lang = request.args.get("lang", "en")
+    return payload_response(g.catalog.language(lang).categories_payload)
+
+# Optional text fields of a body, like region and submission_id, go to SQLite
+# as query parameters, so anything but a string or null is rejected up front
+def is_optional_text(value):
+    return value is None or isinstance(value, str)
+
+# Scores of a legacy report body: numbers keyed by category, with a maximum for
+# every scored category, as /api/submit returns them
+def is_score_table(category_scores, category_max_scores):
+    def is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    return (
+        isinstance(category_scores, dict) and isinstance(category_max_scores, dict)
+        and all(is_number(score) for score in category_scores.values())
+        and all(is_number(score) for score in category_max_scores.values())
+        and all(category in category_max_scores for category in category_scores)
+    )
 
-        # Add user score for the category
-        for option in question["options"]:
-            if option["text"] == user_answer:
-                total_score += option["score"]
-                category_scores[category] += option["score"]
-                break
+# Score one answer set, keyed or legacy, against a compiled language; returns (result, weak areas, error)
+def score_answers(questions, answers, lang):
+    options, error = questions.chosen_options(answers)
+    if error:
+        return None, None, error
+    result, weak_areas = score_options(questions, options, lang)
+    return result, weak_areas, None
+
+# Score chosen option positions; returns (result, weak areas)
+def score_options(questions, options, lang):
+    # Single pass of direct lookups in the precompiled option scores
+    with span("scoring"):
+        total_score, category_scores = questions.score_options(options)
+    # The catalog's mapping is read-only and shared; each result gets its own copy
+    category_max_scores = dict(questions.category_max_scores)
+    max_score = questions.max_score
 
     # Calculate percentage score
     percentage_score = (total_score / max_score) * 100 if max_score > 0 else 0
 
     # Generate recommendations based on score and category
-    recommendations, weak_areas = generate_recommendations(category_scores, category_max_scores, lang)
+    with span("recommendations"):
+        recommendations, weak_areas = generate_recommendations(category_scores, category_max_scores, lang)
 
-    return jsonify({
+    return {
         "percentage_score": round(percentage_score, 2),
         "category_scores": category_scores,
         "category_max_scores": category_max_scores,
         "recommendations": recommendations
-    })
+    }, weak_areas
 
-TOOL_RECOMMENDATIONS = {
-    "Access Control": ["Okta", "Microsoft Entra ID (Azure AD)"],
-    "Data Protection": ["VeraCrypt", "BitLocker"],
-    "Employee Awareness and Training": ["KnowBe4", "Infosec IQ"],
-    "Governance and Policies": ["NIST Cybersecurity Framework", "CIS Controls"],
-    "Incident Response and Recovery": ["Splunk SOAR", "IBM Resilient"],
-    "Network Security": ["Snort", "Wireshark"],
-    "Third-Party Risk Management": ["OneTrust", "Prevalent"],
-}
-# PDF Class
-class PDF(FPDF):
-    def footer(self):
-        """ Add page numbers on all pages except cover. """
-        self.set_y(-15)
-        self.set_font("DejaVu", size=10)
-        if self.page_no() > 1:
-            self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "C")
-
-# Function to get questions by language
-def get_questions_by_language(lang):
-    if lang not in ["en", "pt"]:
-        lang = "en"  # Default to English if unsupported language is requested
-    return [{**q, "category": q["category"][lang], "text": q["text"][lang],
-             "options": [{"text": opt["text"][lang], "score": opt["score"], "recommendation": opt["recommendation"][lang]} for opt in q["options"]]}
-            for q in questions_data]
-
-# Recommended cybersecurity tools based on categories
-TOOL_RECOMMENDATIONS = {
-    "Access Control": ["Okta", "Microsoft Entra ID (Azure AD)"],
-    "Data Protection": ["VeraCrypt", "BitLocker"],
-    "Employee Awareness and Training": ["KnowBe4", "Infosec IQ"],
-    "Governance and Policies": ["NIST Cybersecurity Framework", "CIS Controls"],
-    "Incident Response and Recovery": ["Splunk SOAR", "IBM Resilient"],
-    "Network Security": ["Snort", "Wireshark"],
-    "Third-Party Risk Management": ["OneTrust", "Prevalent"],
-}
-
-CATEGORY_MAPPING = {
-    "governança e políticas": "Governance and Policies",
-    "proteção de dados": "Data Protection",
-    "controle de acesso": "Access Control",
-    "treinamento e conscientização de funcionários": "Employee Awareness and Training",
-    "resposta e recuperação de incidentes": "Incident Response and Recovery",
-    "segurança de rede": "Network Security",
-    "gestão de risco de terceiros": "Third-Party Risk Management",
-}
+# Endpoint to process answers and calculate score (supports language selection)
+@app.route("/api/submit", methods=["POST"])
+def submit_answers():
+    data = request.json
+    lang = request.args.get("lang", "en")  # Get language from request
+
+    if not isinstance(data, dict) or "answers" not in data:
+        return jsonify({"error": "Invalid input"}), 400
+    if not is_optional_text(data.get("region")):
+        return jsonify({"error": "region must be a string"}), 400
+
+    with span("catalog_lookup"):
+        questions = g.catalog.language(lang)
+    options, error = questions.chosen_options(data["answers"])
+    if error:
+        return jsonify({"error": error}), 400
+    result, _ = score_options(questions, options, lang)
+
+    # Rank against the submissions stored before this one
+    if request.args.get("benchmark") == "1" and score_benchmark is not None:
+        with span("benchmark_lookup"):
+            result["benchmark"] = score_benchmark.ranks(questions, result)
+
+    # Keep the submission so reports and dashboards can be served from it later,
+    # in the keyed form so it can be reported in any language
+    if assessment_store is not None:
+        result["submission_id"] = assessment_store.record(
+            questions.lang, questions.keyed_answers(options), result, g.catalog.version, data.get("region"),
+            questions.category_keys,
+        )
+    return jsonify(result)
+
+# Running totals over the answer sets of a batch
+class BatchStats:
+    def __init__(self, questions):
+        self.categories = questions.categories
+        self.category_max_scores = dict(questions.category_max_scores)
+        self.total = 0
+        self.scored = 0
+        self.failed = 0
+        self.percentage_sum = 0.0
+        self.percentage_min = None
+        self.percentage_max = None
+        self.category_sums = np.zeros(len(self.categories))
+        self.weak_counts = np.zeros(len(self.categories), dtype=np.int64)
+
+    # Fold in a vectorized chunk of scores and the rounded percentages reported for it
+    def add(self, cohort, percentages):
+        if not percentages:
+            return
+        self.scored += len(percentages)
+        self.percentage_sum += sum(percentages)
+        self.percentage_min = min(percentages) if self.percentage_min is None else min(self.percentage_min, min(percentages))
+        self.percentage_max = max(percentages) if self.percentage_max is None else max(self.percentage_max, max(percentages))
+        self.category_sums += cohort.category_scores.sum(axis=0)
+        self.weak_counts += cohort.weak.sum(axis=0)
+
+    def summary(self):
+        scored = self.scored or 1
+        return {
+            "total": self.total,
+            "scored": self.scored,
+            "failed": self.failed,
+            "average_percentage_score": round(self.percentage_sum / scored, 2) if self.scored else None,
+            "min_percentage_score": self.percentage_min,
+            "max_percentage_score": self.percentage_max,
+            "average_category_scores": {
+                category: round(float(total) / scored, 2) for category, total in zip(self.categories, self.category_sums)
+            },
+            "category_max_scores": self.category_max_scores,
+            "weak_category_counts": dict(zip(self.categories, self.weak_counts.tolist())),
+        }
+
+# Answer sets scored together by the vectorized engine in /api/submit/batch
+BATCH_CHUNK_SIZE = 512
+
+# Score a chunk of batch items with the vectorized engine; returns one result line
+# per item, recording the valid ones in the assessment store when `store` is set
+def score_batch_chunk(questions, chunk, lang, stats, store=False, region=None):
+    lines = []
+    valid_rows = []
+    for index, item in chunk:
+        stats.total += 1
+        # Each item is either a bare answer list or {"id": ..., "answers": [...] or {...}}
+        submission_id = item.get("id") if isinstance(item, dict) else None
+        answers = item.get("answers") if isinstance(item, dict) else item
+
+        line = {"index": index, "id": submission_id}
+        options, error = questions.chosen_options(answers)
+        if error:
+            line["error"] = error
+            stats.failed += 1
+        else:
+            valid_rows.append((line, options))
+        lines.append(line)
+
+    with span("batch_scoring"):
+        cohort = engine_for(questions).score_options([options for _, options in valid_rows])
+    percentages = []
+    category_max_scores = dict(questions.category_max_scores)
+    for row, (line, _) in enumerate(valid_rows):
+        result = cohort.row(row)
+        line.update(result)
+        line["category_max_scores"] = category_max_scores
+        line["recommendations"] = recommendation_message(cohort.weak_categories(row), lang)
+        percentages.append(result["percentage_score"])
+    stats.add(cohort, percentages)
+
+    if store and valid_rows:
+        submissions = [
+            (questions.lang, questions.keyed_answers(options), line, g.catalog.version, region) for line, options in valid_rows
+        ]
+        for (line, _), submission_id in zip(valid_rows, assessment_store.record_many(submissions, questions.category_keys)):
+            line["submission_id"] = submission_id
+    return lines
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl")
+
+# Answer sets of an NDJSON batch body, parsed line by line as the body is read
+def iter_ndjson_items(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+# Endpoint to score many answer sets in one request; accepts a JSON array (or
+# {"submissions": [...]}) or an NDJSON body, and streams one NDJSON line per
+# answer set followed by a line with aggregate statistics
+@app.route("/api/submit/batch", methods=["POST"])
+def submit_batch():
+    lang = request.args.get("lang", "en")
+    with span("catalog_lookup"):
+        questions = g.catalog.language(lang)
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = iter_ndjson_items(request.stream)
+    else:
+        items = request.get_json(silent=True)
+        if isinstance(items, dict):
+            items = items.get("submissions")
+        if not isinstance(items, list):
+            return jsonify({"error": "Expected a JSON array of answer sets"}), 400
+
+    store = request.args.get("store") == "1" and assessment_store is not None
+    region = request.args.get("region")
+
+    def generate():
+        stats = BatchStats(questions)
+        chunk = []
+        for index, item in enumerate(items):
+            chunk.append((index, item))
+            if len(chunk) == BATCH_CHUNK_SIZE:
+                for line in score_batch_chunk(questions, chunk, lang, stats, store, region):
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+                chunk = []
+        for line in score_batch_chunk(questions, chunk, lang, stats, store, region):
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        yield json.dumps({"summary": stats.summary()}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# Report inputs of a stored submission from its stored scores, with its categories
+# under their names in this language where the question bank still has them, and
+# its answers to the questions that are still asked, matched by question id
+def stored_report_inputs(questions, submission):
+    def localized(category):
+        return questions.category_names.get(questions.category_keys.get(category), category)
+
+    stored_answers = submission["answers"] if isinstance(submission["answers"], dict) else {}
+    options = []
+    for q, scores in zip(questions.questions, questions.option_scores):
+        option = stored_answers.get(str(q["id"]))
+        valid = isinstance(option, int) and not isinstance(option, bool) and 0 <= option < len(scores)
+        options.append(option if valid else None)
+    return (
+        questions.answer_texts(options),
+        {localized(category): score for category, score in submission["category_scores"].items()},
+        {localized(category): score for category, score in submission["category_max_scores"].items()},
+    )
+
+# Prepare the report for one request body: a stored submission, keyed answers, or
+# the answers and scores returned by /api/submit. Returns (questions, report, error, status).
+def report_from_body(data, lang):
+    submission = None
+    if isinstance(data, dict) and data.get("submission_id") and assessment_store is not None:
+        if not isinstance(data["submission_id"], str):
+            return None, None, "submission_id must be a string", 400
+        submission = assessment_store.get(data["submission_id"])
+        if submission is None:
+            return None, None, "Unknown submission", 404
+        data = submission
+        lang = request.args.get("lang", submission["lang"])
+
+    # Load questions
+    with span("catalog_lookup"):
+        questions = g.catalog.language(lang)
+
+    # A submission stored against another version of the question bank may not
+    # answer the current one, so it is reported with the scores it got then
+    if submission is not None and submission["questions_version"] != g.catalog.version:
+        answers, category_scores, category_max_scores = stored_report_inputs(questions, submission)
+
+    # Keyed answers are enough on their own: the scores are derived in the report's
+    # language, so a submission made in one language can be reported in another
+    elif isinstance(data, dict) and isinstance(data.get("answers"), dict):
+        options, error = questions.chosen_options(data["answers"])
+        if error:
+            return None, None, error, 400
+        answers = questions.answer_texts(options)
+        _, category_scores = questions.score_options(options)
+        category_max_scores = questions.category_max_scores
+
+    # Validate input
+    elif not isinstance(data, dict) or "answers" not in data or "category_scores" not in data or "category_max_scores" not in data or "recommendations" not in data:
+        return None, None, "Invalid input", 400
+
+    else:
+        answers = data["answers"]
+        category_scores = data["category_scores"]
+        category_max_scores = data["category_max_scores"]
+        if not isinstance(answers, list) or not is_score_table(category_scores, category_max_scores):
+            return None, None, "Invalid input", 400
 
+    with span("report_prepare"):
+        report = prepare_report(questions, questions.lang, answers, category_scores, category_max_scores)
+    return questions, report, None, 200
 
 @app.route("/api/generate-pdf", methods=["POST"])
 def generate_pdf():
     data = request.json
     lang = request.args.get("lang", "en")  # Support language selection
 
-    # Load questions
-    questions = get_questions_by_language(lang)
-
-    # Validate input
-    if not data or "answers" not in data or "category_scores" not in data or "category_max_scores" not in data or "recommendations" not in data:
-        return jsonify({"error": "Invalid input"}), 400
+    questions, report, error, status = report_from_body(data, lang)
+    if error:
+        return jsonify({"error": error}), status
+    download_name = report_text(questions.lang)["download_name"]
+
+    # Identical inputs against the same question bank always produce the same document
+    cache_key = report_cache_key(g.catalog.version, report)
+    pdf_bytes = report_cache.get(cache_key)
+
+    # Legacy bodies name their own categories; only known keys get a series of their own
+    for category in report["weak_categories"]:
+        WEAK_CATEGORIES.inc(lang=questions.lang, category=category if category in questions.category_names else "other")
+    logger.info(
+        "report_requested lang=%s cache=%s weak_categories=%s suggested_tools=%s",
+        questions.lang, "hit" if pdf_bytes is not None else "miss",
+        json.dumps(report["weak_categories"], ensure_ascii=False),
+        json.dumps(dict(report["suggested_tools"]), ensure_ascii=False),
+    )
 
-    answers = data["answers"]
-    category_scores = data["category_scores"]
-    category_max_scores = data["category_max_scores"]
-    recommendations = data["recommendations"]
+    if pdf_bytes is not None:
+        if request.args.get("async") == "1":
+            return report_job_accepted(report_jobs.add_done(pdf_bytes, download_name))
+        return pdf_response(pdf_bytes, download_name, cache_status="hit")
 
-    # Calculate category percentages
-    category_percentages = {
-        category: (score / category_max_scores[category]) * 100 if category_max_scores[category] > 0 else 0
-        for category, score in category_scores.items()
-    }
+    # Render in the pool; the result lands in the cache even if the client gives up
+    try:
+        future = render_pool.submit(report)
+    except PoolBusy:
+        response = jsonify({"error": "Too many reports are being generated, try again shortly"})
+        response.headers["Retry-After"] = "5"
+        return response, 429
+    except BrokenProcessPool:
+        return render_interrupted()
+    def cache_rendered(done):
+        if not done.cancelled() and done.exception() is None:
+            report_cache.put(cache_key, done.result())
+    future.add_done_callback(cache_rendered)
+
+    if request.args.get("async") == "1":
+        return report_job_accepted(report_jobs.add(future, download_name))
 
-    # Calculate overall score
-    total_score = sum(category_scores.values())
-    max_score = sum(category_max_scores.values())
-    percentage_score = (total_score / max_score) * 100 if max_score > 0 else 0
+    try:
+        pdf_bytes = future.result(timeout=REPORT_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({"error": "Report generation timed out"}), 504
+    except BrokenProcessPool:
+        return render_interrupted()
+    return pdf_response(pdf_bytes, download_name, cache_status="miss")
+
+# A render worker died while the report was queued or rendering; the pool starts
+# new workers, so the same request can simply be retried
+def render_interrupted():
+    response = jsonify({"error": "Report generation was interrupted, try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+# Many reports in one ZIP archive, rendered in parallel and streamed as each one
+# finishes. The body is a JSON array (or {"reports": [...]}) or NDJSON, and each
+# item is any /api/generate-pdf body, plus an optional "id" for the file name.
+# The archive ends with manifest.json, giving the file or the error of every item.
+@app.route("/api/generate-pdf/bulk", methods=["POST"])
+def generate_pdf_bulk():
+    lang = request.args.get("lang", "en")
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = iter_ndjson_items(request.stream)
+    else:
+        items = request.get_json(silent=True)
+        if isinstance(items, dict):
+            items = items.get("reports")
+        if not isinstance(items, list):
+            return jsonify({"error": "Expected a JSON array of reports"}), 400
+
+    version = g.catalog.version
+    manifest = {}
+
+    # Reports found in the cache skip the pool; rendered ones are not added to it,
+    # so a large campaign does not evict the reports people are downloading
+    def jobs():
+        for index, item in enumerate(items):
+            name = item.get("id", item.get("submission_id")) if isinstance(item, dict) else None
+            # The archive is already streaming, so a bad item is only recorded in the manifest
+            try:
+                _, report, error, _ = report_from_body(item, lang)
+            except Exception:
+                logger.exception("Bulk report %d could not be prepared", index)
+                report, error = None, "Invalid input"
+            if error:
+                manifest[index] = {"index": index, "id": name, "error": error}
+                continue
+            manifest[index] = {"index": index, "id": name, "file": entry_name(index, name)}
+            yield index, report, report_cache.get(report_cache_key(version, report))
+
+    def entries():
+        for index, result in render_unordered(render_pool, jobs(), BULK_REPORT_IN_FLIGHT):
+            if isinstance(result, BaseException):
+                logger.warning("Bulk report %d failed: %s", index, result)
+                manifest[index] = {"index": index, "id": manifest[index]["id"], "error": "Report generation failed"}
+                continue
+            yield manifest[index]["file"], result
+        summary = [manifest[index] for index in sorted(manifest)]
+        yield "manifest.json", json.dumps(summary, ensure_ascii=False, indent=2).encode("utf-8")
+
+    return Response(
+        stream_with_context(iter_zip(entries())), mimetype="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="reports.zip"'},
+    )
 
-    # Identify weak categories
-    weak_categories = [
-        category.strip().lower() for category, percentage in category_percentages.items() if percentage < 50
+# Stream rendered bytes in fixed-size slices instead of copying them into a file object
+def iter_chunks(data, size=PDF_CHUNK_SIZE):
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield bytes(view[start:start + size])
+
+def pdf_response(pdf_bytes, download_name, cache_status=None):
+    response = Response(iter_chunks(pdf_bytes), mimetype="application/pdf", direct_passthrough=True)
+    response.headers["Content-Length"] = str(len(pdf_bytes))
+    response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    if cache_status:
+        response.headers["X-Report-Cache"] = cache_status
+    return response
+
+def report_job_accepted(job_id):
+    response = jsonify({"job_id": job_id, "status_url": f"/api/reports/{job_id}"})
+    response.headers["Location"] = f"/api/reports/{job_id}"
+    return response, 202
+
+# Poll an asynchronous report job; once it is done the PDF itself is returned
+@app.route("/api/reports/<job_id>", methods=["GET"])
+def get_report(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown report job"}), 404
+
+    status = report_jobs.status(job)
+    if status == "done":
+        return pdf_response(job["future"].result(), job["download_name"])
+    if status == "failed":
+        future = job["future"]
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            return render_interrupted()
+        return jsonify({"job_id": job_id, "status": status, "error": "Report generation failed"}), 500
+    return jsonify({"job_id": job_id, "status": status}), 202
+
+# A stored submission with its answers and scores
+@app.route("/api/submissions/<submission_id>", methods=["GET"])
+def get_submission(submission_id):
+    if assessment_store is None:
+        return jsonify({"error": "Submission storage is disabled"}), 404
+    submission = assessment_store.get(submission_id)
+    if submission is None:
+        return jsonify({"error": "Unknown submission"}), 404
+    return jsonify(submission)
+
+# Live score of a scoring session; percentages and weak areas cover the questions
+# answered so far, so a complete session matches /api/submit for the same answers
+def session_preview(session, questions):
+    weak_areas = [
+        category for category, score, answered_max in session["categories"]
+        if answered_max > 0 and (score / answered_max) < 0.5
     ]
-    weak_categories_english = [CATEGORY_MAPPING.get(cat, cat) for cat in weak_categories]
-
-
-    # Extract recommendations based on answers
-    extracted_recommendations = {}
-    for idx, answer in enumerate(answers):
-        if idx < len(questions):  # Ensure index is within range
-            question_text = questions[idx]["text"]
-            category = questions[idx]["category"]
-            
-            # Find the corresponding recommendation in the selected language
-            recommendation = next(
-                (opt["recommendation"] for opt in questions[idx]["options"] if opt["text"] == answer),
-                "No specific recommendation" if lang == "en" else "Sem recomendação específica"
-            )
-
-            if category not in extracted_recommendations:
-                extracted_recommendations[category] = []
-            extracted_recommendations[category].append(f"• {recommendation}")
-
-    # Filter suggested tools based on weak categories
-    suggested_tools = {
-        cat: TOOL_RECOMMENDATIONS.get(cat, []) for cat in weak_categories_english
+    answered_max = session["answered_max_score"]
+    percentage_score = (session["total_score"] / answered_max) * 100 if answered_max > 0 else 0
+    return {
+        "session_id": session["id"],
+        "lang": session["lang"],
+        "questions_version": session["questions_version"],
+        "answered": session["answered"],
+        "total_questions": len(questions),
+        "complete": session["answered"] == len(questions),
+        "percentage_score": round(percentage_score, 2),
+        "category_scores": {category: score for category, score, _ in session["categories"]},
+        "category_max_scores": dict(questions.category_max_scores),
+        "weak_areas": weak_areas,
+        "recommendations": recommendation_message(weak_areas, session["lang"]),
     }
 
-    # ✅ Create PDF
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
+# Session and the compiled language it was started with, or an error response
+def load_session(session_id, with_answers=False):
+    if assessment_store is None:
+        return None, None, (jsonify({"error": "Session storage is disabled"}), 404)
+    session = assessment_store.get_session(session_id, with_answers)
+    if session is None:
+        return None, None, (jsonify({"error": "Unknown session"}), 404)
+    # Positions and scores are only meaningful against the questions the session started with
+    if session["questions_version"] != g.catalog.version:
+        return None, None, (jsonify({"error": "The questionnaire changed since this session started; start a new one"}), 409)
+    return session, g.catalog.language(session["lang"]), None
+
+# Start answering a questionnaire one question at a time
+@app.route("/api/sessions", methods=["POST"])
+def create_session():
+    if assessment_store is None:
+        return jsonify({"error": "Session storage is disabled"}), 404
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not is_optional_text(data.get("region")):
+        return jsonify({"error": "region must be a string"}), 400
+    questions = g.catalog.language(request.args.get("lang", "en"))
+
+    assessment_store.expire_sessions(time.time() - SESSION_TTL)
+    session_id = assessment_store.create_session(questions.lang, g.catalog.version, questions.categories, data.get("region"))
+    response = jsonify(session_preview(assessment_store.get_session(session_id), questions))
+    response.headers["Location"] = f"/api/sessions/{session_id}"
+    return response, 201
+
+# Current score of a session, plus its answers as {question_id: option index}
+@app.route("/api/sessions/<session_id>", methods=["GET"])
+def get_session(session_id):
+    session, questions, error = load_session(session_id, with_answers=True)
+    if error:
+        return error
+    result = session_preview(session, questions)
+    result["answers"] = {questions.questions[position]["id"]: option for position, option in session["answers"].items()}
+    return jsonify(result)
+
+# Answer one question: {"question_id": 12, "option": 0} (option position), or
+# {"question_id": 12, "answer": "Yes"} (option text); "option": null clears the
+# answer. Only that question's category and the totals are updated.
+@app.route("/api/sessions/<session_id>", methods=["PATCH"])
+def answer_session(session_id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or "question_id" not in data:
+        return jsonify({"error": "Expected question_id and option"}), 400
+
+    session, questions, error = load_session(session_id)
+    if error:
+        return error
+    question_id = data["question_id"]
+    # Only ids and their string form; other JSON values (lists, objects) can't be looked up
+    valid_id = isinstance(question_id, (int, str)) and not isinstance(question_id, bool)
+    position = questions.question_positions.get(question_id) if valid_id else None
+    if position is None:
+        return jsonify({"error": "Unknown question"}), 400
+
+    options = questions.questions[position]["options"]
+    option = data.get("option")
+    if "answer" in data:
+        option = questions.option_positions[position].get(data["answer"]) if isinstance(data["answer"], str) else None
+        if option is None:
+            return jsonify({"error": "Unknown answer"}), 400
+    elif "option" not in data:
+        return jsonify({"error": "Expected question_id and option"}), 400
+    elif option is not None and (not isinstance(option, int) or isinstance(option, bool) or not 0 <= option < len(options)):
+        return jsonify({"error": "Unknown option"}), 400
+
+    with span("session_update"):
+        session = assessment_store.answer_session(
+            session_id, position, questions.category_positions[questions.question_categories[position]],
+            option, options[option]["score"] if option is not None else 0, questions.question_max_scores[position],
+        )
+    if session is None:
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify(session_preview(session, questions))
+
+# Turn a complete session into a stored submission, as /api/submit would
+@app.route("/api/sessions/<session_id>/submit", methods=["POST"])
+def submit_session(session_id):
+    session, questions, error = load_session(session_id, with_answers=True)
+    if error:
+        return error
+    if session["answered"] != len(questions):
+        return jsonify({"error": "Incomplete answers"}), 400
 
-    # ✅ Load Fonts
-    try:
-        pdf.add_font("DejaVu", "", os.path.abspath(FONT_PATH), uni=True)
-        pdf.add_font("DejaVu", "B", os.path.abspath(FONT_PATH_BOLD), uni=True)
-    except Exception as e:
-        print(f"🚨 Error loading fonts: {e}")
-        raise
-
-    pdf.set_font("DejaVu", "", 12)
-
-    # ✅ **Front Page**
-    pdf.add_page()
-    pdf.image(os.path.join(IMAGE_DIR, "background.png"), x=0, y=0, w=210, h=297)
-
-    pdf.set_font("DejaVu", "B", size=22)  # Reduced font size to fit within width
-    pdf.set_y(80)  # Adjust position
-
-    # ✅ Use `multi_cell()` to avoid overflow
-    pdf.multi_cell(190, 10, txt="Cybersecurity Diagnostic Report" if lang == "en" else "Relatório de Diagnóstico de Cibersegurança",
-                align="C")
-
-    pdf.set_y(120)
-    pdf.set_font("DejaVu", size=14)
-    pdf.cell(0, 10, txt="Report Date: 2025", ln=True, align="C")
-
-    # ✅ Centering the logo properly
-    pdf.image(os.path.join(IMAGE_DIR, "logo_hq.png"), x=(210-50)/2, y=180, w=50)
-
-    pdf.image(os.path.join(IMAGE_DIR, "logo_hq.png"), x=80, y=180, w=50)
-
-    # ✅ Add Category Breakdown
-    pdf.add_page()
-    pdf.set_font("DejaVu", "B", size=18)
-    pdf.cell(0, 10, txt="Category Breakdown" if lang == "en" else "Desempenho por Categoria", ln=True)
-    pdf.ln(5)
-
-    pdf.set_font("DejaVu", size=12)
-    for category, score in category_scores.items():
-        max_cat_score = category_max_scores.get(category, "N/A")
-        pdf.cell(200, 10, txt=f"{category}: {score}/{max_cat_score} ({round(category_percentages[category], 2)}%)", ln=True)
-
-    pdf.ln(10)
-
-    # ✅ **Recommendations**
-    pdf.add_page()
-    pdf.set_font("DejaVu", "B", size=18)
-    pdf.cell(0, 10, txt="Recommendations" if lang == "en" else "Recomendações", ln=True)
-    pdf.ln(5)
-
-    pdf.set_font("DejaVu", size=12)
-    for category, recs in extracted_recommendations.items():
-        pdf.set_font("DejaVu", style="B", size=14)
-        pdf.cell(0, 10, txt=category, ln=True)
-        pdf.ln(5)
-
-        pdf.set_font("DejaVu", size=12)
-        for rec in recs:
-            pdf.multi_cell(0, 8, rec)
-            pdf.ln(3)
-
-    pdf.ln(10)
-
-    REVERSE_CATEGORY_MAPPING = {v: k for k, v in CATEGORY_MAPPING.items()}
-
-    if suggested_tools and any(tools for tools in suggested_tools.values()):  # Ensure at least one tool exists
-        pdf.add_page()
-        pdf.set_font("DejaVu", "B", size=18)
-        pdf.cell(0, 10, txt="Suggested Tools for Improvement" if lang == "en" else "Ferramentas Recomendadas", ln=True)
-        pdf.ln(5)
-
-        pdf.set_font("DejaVu", size=12)
-        for category, tools in suggested_tools.items():
-            # Se a linguagem for PT, converte os nomes das categorias para português
-            category_display = REVERSE_CATEGORY_MAPPING.get(category, category) if lang == "pt" else category
-
-            if tools:  # Ensure there are tools before printing
-                pdf.set_font("DejaVu", "B", size=14)
-                pdf.cell(0, 10, txt=category_display, ln=True)
-                pdf.ln(3)
-                pdf.set_font("DejaVu", size=12)
-                for tool in tools:
-                    pdf.cell(0, 8, txt=f"• {tool}", ln=True)
-                pdf.ln(5)
-
-    # ✅ Save PDF and Send Response
-    pdf_output = io.BytesIO()
-    pdf_bytes = pdf.output(dest="S").encode("latin1", "ignore")
-    pdf_output.write(pdf_bytes)
-    pdf_output.seek(0)
-    print("✅ Weak Categories:", weak_categories_english)
-    print("🔍 Suggested Tools Mapping:", suggested_tools)
-
-
-
-    return send_file(
-        pdf_output,
-        mimetype="application/pdf",
-        as_attachment=True,
-        download_name="cybersecurity_diagnostic_report.pdf" if lang == "en" else "diagnostico_ciberseguranca.pdf",
+    options = [session["answers"][position] for position in range(len(questions))]
+    result, _ = score_options(questions, options, questions.lang)
+    result["submission_id"] = assessment_store.record(
+        questions.lang, questions.keyed_answers(options), result, g.catalog.version, session["region"],
+        questions.category_keys,
     )
+    return jsonify(result)
+
+# Percentile ranks of a result among all stored submissions, overall and per
+# category. The body is {"submission_id": ...} for a stored submission, or the
+# answers to score without storing them.
+@app.route("/api/benchmark", methods=["POST"])
+def benchmark():
+    if score_benchmark is None:
+        return jsonify({"error": "Submission storage is disabled"}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid input"}), 400
 
-if __name__ == "__main__":
-    app.run(debug=True)
+    if data.get("submission_id"):
+        if not isinstance(data["submission_id"], str):
+            return jsonify({"error": "submission_id must be a string"}), 400
+        result = assessment_store.get(data["submission_id"])
+        if result is None:
+            return jsonify({"error": "Unknown submission"}), 404
+        questions = g.catalog.language(request.args.get("lang", result["lang"]))
+    else:
+        questions = g.catalog.language(request.args.get("lang", "en"))
+        result, _, error = score_answers(questions, data.get("answers"), questions.lang)
+        if error:
+            return jsonify({"error": error}), 400
+
+    with span("benchmark_lookup"):
+        ranks = score_benchmark.ranks(questions, result)
+    return jsonify({"percentage_score": result["percentage_score"], **ranks})
+
+# Aggregates over stored submissions, filtered by lang, region, category and an
+# ISO date range (since inclusive, until exclusive)
+@app.route("/api/stats", methods=["GET"])
+def get_stats():
+    if assessment_store is None:
+        return jsonify({"error": "Submission storage is disabled"}), 404
+    try:
+        since = parse_timestamp(request.args["since"]) if request.args.get("since") else None
+        until = parse_timestamp(request.args["until"]) if request.args.get("until") else None
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO dates"}), 400
+
+    filters = {"lang": request.args.get("lang"), "region": request.args.get("region"), "since": since, "until": until}
+    # Categories are filtered and grouped by key, whatever language they were
+    # submitted in, and named in the `lang` filter's language (English without it)
+    questions = g.catalog.language(request.args.get("lang") or DEFAULT_LANGUAGE)
+    category = request.args.get("category")
+    if category is not None:
+        category = questions.category_keys.get(category, category)
+    categories = assessment_store.category_averages(category=category, **filters)
+    for row in categories:
+        row["category"] = questions.category_names.get(row["key"], row["key"])
+    return jsonify({
+        "overall": assessment_store.overall_stats(**filters),
+        "categories": categories,
+    })
 
+# Hit/miss counters of the rendered report cache
+@app.route("/api/reports/cache", methods=["GET"])
+def report_cache_stats():
+    return jsonify(report_cache.stats())
+
+# Prometheus metrics: request and hot-path timings, cache and queue gauges
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(REGISTRY.exposition(), content_type=CONTENT_TYPE)
+
+# Stacks collected by the sampling profiler, in folded format for flame graph
+# tools; ?reset=1 starts a new collection after reading
+@app.route("/api/debug/profile", methods=["GET"])
+def get_profile():
+    if profiler is None:
+        return jsonify({"error": "Set SAMPLING_PROFILER_INTERVAL to enable the profiler"}), 404
+    folded = profiler.folded(include_idle=request.args.get("idle") == "1")
+    if request.args.get("reset") == "1":
+        profiler.reset()
+    return Response(folded, mimetype="text/plain")
+
+# Liveness: the process is up and answering
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+# Readiness: assets are loaded and the process is not shutting down
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    if draining.is_set():
+        return jsonify({"status": "draining"}), 503
+    # serve.py loads the assets before forking; under any other WSGI server the
+    # first probe loads them
+    if not ready.is_set():
+        try:
+            preload_report_assets()
+        except Exception:
+            logger.exception("Could not load the report assets")
+            return jsonify({"status": "not ready"}), 503
+    return jsonify({"status": "ready", "questions_version": catalog.version})
+
+# Parse fonts and images and lay out each language's cover before serving
+def preload_report_assets():
+    assets = get_report_assets()
+    for lang in catalog.languages:
+        assets.new_document(lang)
+    ready.set()
+    return assets
 
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    preload_report_assets()
+    app.run(debug=True)
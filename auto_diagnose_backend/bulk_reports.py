@@ -0,0 +1,97 @@
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+import re
+import time
+import zipfile
+
+from render_pool import PoolBusy
+
+# Entries get a fixed date so the same reports always make the same archive
+ZIP_DATE = (2025, 1, 1, 0, 0, 0)
+
+
+# Write-only file for zipfile that hands over the bytes written so far. It
+# cannot seek, so zipfile streams each entry with a data descriptor.
+class _ZipSink:
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(data if isinstance(data, bytes) else bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+# Stream a ZIP archive of (name, bytes) entries, yielding its bytes as each entry
+# is added; only the entry being written is held in memory. PDFs are already
+# compressed, so entries are stored as they are.
+def iter_zip(entries, compression=zipfile.ZIP_STORED):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, ZIP_DATE)
+            info.compress_type = compression
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+# File name inside the archive for the report of item `index`
+def entry_name(index, name=None):
+    label = re.sub(r"[^\w.-]+", "_", str(name)).strip("._")[:80] if name is not None else ""
+    return f"{index + 1:05d}-{label or 'report'}.pdf"
+
+
+# Render reports in the pool with at most `in_flight` of them queued or running
+# at a time, yielding (key, pdf bytes or exception) in the order they finish.
+# `jobs` yields (key, report, result); items that already have a result (a cached
+# PDF or an error) are passed through without rendering. When the pool is full
+# with other requests' reports, waits for a slot instead of failing.
+def render_unordered(pool, jobs, in_flight):
+    pending = {}
+
+    def finished(timeout=None):
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = pending.pop(future)
+            error = future.exception()
+            yield key, error if error is not None else future.result()
+
+    try:
+        for key, report, result in jobs:
+            if result is not None:
+                yield key, result
+                continue
+            while True:
+                if len(pending) >= in_flight:
+                    yield from finished()
+                    continue
+                try:
+                    future = pool.submit(report)
+                    break
+                except PoolBusy:
+                    if pending:
+                        yield from finished()
+                    else:
+                        time.sleep(0.05)
+                except BrokenProcessPool as e:
+                    # Failed like the reports that were rendering when the worker died
+                    future = Future()
+                    future.set_exception(e)
+                    break
+            pending[future] = key
+            # Hand over whatever is already done without waiting
+            yield from finished(timeout=0)
+        while pending:
+            yield from finished()
+    finally:
+        # The client went away: drop the reports that have not started yet
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,458 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from types import MappingProxyType
+
+from question_bank import build_question_bank, read_question_bank
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Obtém o diretório base do script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_PATH = os.path.join(BASE_DIR, "questions", "questions.json")
+
+# Compiled form of questions.json built by utility/compile_questions.py (empty disables it)
+COMPILED_QUESTIONS_PATH = os.environ.get("QUESTIONS_COMPILED", os.path.join(BASE_DIR, "questions", "questions.bin"))
+
+# Languages come from the question bank; this one must be complete and is used
+# for unknown languages and as the stable key of each category
+DEFAULT_LANGUAGE = "en"
+
+logger = logging.getLogger(__name__)
+
+
+# Read-only view of parsed JSON: objects become mapping proxies and arrays tuples
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+# Catalog objects are shared by every request thread and replaced whole when the
+# question bank changes, never edited in place; once built they refuse changes
+class _ReadOnly:
+    _frozen = False
+
+    def _freeze(self):
+        object.__setattr__(self, "_frozen", True)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"{type(self).__name__} is read-only")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if self._frozen:
+            raise AttributeError(f"{type(self).__name__} is read-only")
+        object.__delattr__(self, name)
+
+
+# Pre-encoded JSON body with compressed variants and a strong content-hash ETag
+class EncodedPayload(_ReadOnly):
+    def __init__(self, obj):
+        body = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+        self.variants = MappingProxyType(self.variants)
+        self._freeze()
+
+    # Payload whose variants were encoded earlier, e.g. read from a compiled question bank
+    @classmethod
+    def from_variants(cls, variants):
+        payload = cls.__new__(cls)
+        payload.variants = MappingProxyType(dict(variants))
+        payload.etag = hashlib.sha256(payload.variants["identity"]).hexdigest()[:32]
+        payload._freeze()
+        return payload
+
+    # Each encoding is its own representation, so it gets its own strong ETag
+    def etag_for(self, encoding):
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+
+# Questions, indexes and maximum scores for a single language, built once per catalog
+class LanguageCatalog(_ReadOnly):
+    def __init__(self, lang, raw_questions, payload=None):
+        self.lang = lang
+
+        questions = []
+        option_positions = []
+        option_scores = []
+        question_categories = []
+        category_keys = {}
+        category_names = {}
+        question_max_scores = []
+        category_max_scores = {}
+
+        for q in raw_questions:
+            category = q["category"][lang]
+            # Every localized name of the category, in any language, leads to its key
+            key = q["category"][DEFAULT_LANGUAGE]
+            category_names[key] = category
+            for name in q["category"].values():
+                category_keys.setdefault(name, key)
+            options = [
+                {"text": opt["text"][lang], "score": opt["score"], "recommendation": opt["recommendation"][lang]}
+                for opt in q["options"]
+            ]
+            questions.append({**q, "category": category, "text": q["text"][lang], "options": options})
+
+            # Answer text -> option position, which translates the legacy text answers;
+            # the first option wins on duplicated texts
+            positions = {}
+            for position, option in enumerate(options):
+                positions.setdefault(option["text"], position)
+            option_positions.append(positions)
+            option_scores.append(tuple(option["score"] for option in options))
+            question_categories.append(category)
+
+            max_question_score = max(option["score"] for option in options)
+            question_max_scores.append(max_question_score)
+            category_max_scores[category] = category_max_scores.get(category, 0) + max_question_score
+
+        self.questions = freeze(questions)
+        self.option_positions = tuple(MappingProxyType(positions) for positions in option_positions)
+        # Their lookups bound once: going through the read-only views costs a third more per answer
+        self._option_lookups = tuple(positions.get for positions in option_positions)
+        self.option_scores = tuple(option_scores)
+        self.question_categories = tuple(question_categories)
+        self.question_max_scores = tuple(question_max_scores)
+        # Question id (or its string form, as in JSON object keys) -> position in the questionnaire
+        question_positions = {}
+        for position, q in enumerate(questions):
+            question_positions[q["id"]] = question_positions[str(q["id"])] = position
+        self.question_positions = MappingProxyType(question_positions)
+        self.categories = tuple(category_max_scores)
+        self.category_positions = MappingProxyType({category: position for position, category in enumerate(self.categories)})
+        self.category_max_scores = MappingProxyType(category_max_scores)
+        self.max_score = sum(category_max_scores.values())
+        # Localized category name -> stable key (its name in the default language), and back;
+        # this language's names win if another language uses the same name for another category
+        category_keys.update({name: key for key, name in category_names.items()})
+        self.category_keys = MappingProxyType(category_keys)
+        self.category_names = MappingProxyType(category_names)
+
+        # Body served by GET /api/questions, encoded once instead of per request
+        self.questions_payload = payload if payload is not None else EncodedPayload(questions)
+
+        # ?fields=compact: only what the form renders, without scores and recommendations
+        compact = [
+            {
+                "id": q["id"], "category": q["category"], "text": q["text"],
+                "options": [{"text": option["text"]} for option in q["options"]],
+            }
+            for q in questions
+        ]
+        self.payloads = MappingProxyType({"full": self.questions_payload, "compact": EncodedPayload(compact)})
+        # ?category=: one section of the questionnaire per request, keyed by category key
+        self.category_payloads = MappingProxyType({
+            fields: MappingProxyType({
+                category_keys[category]: EncodedPayload([q for q in items if q["category"] == category])
+                for category in self.categories
+            })
+            for fields, items in (("full", questions), ("compact", compact))
+        })
+        # GET /api/questions/categories: the sections, in questionnaire order
+        question_counts = {}
+        for category in question_categories:
+            question_counts[category] = question_counts.get(category, 0) + 1
+        self.categories_payload = EncodedPayload([
+            {"key": category_keys[category], "name": category, "questions": question_counts[category]}
+            for category in self.categories
+        ])
+        self._freeze()
+
+    def __len__(self):
+        return len(self.questions)
+
+    # Option position chosen for each question from either answer format:
+    # {question_id: option position}, which is the same in every language, or the
+    # legacy list of option texts in question order. None stands for an answer
+    # that matches no option (null in the keyed format) and scores nothing.
+    # Returns (options, error).
+    def chosen_options(self, answers):
+        if isinstance(answers, dict):
+            options = [None] * len(self.questions)
+            answered = set()
+            for question_id, option in answers.items():
+                position = self.question_positions.get(question_id)
+                if position is None:
+                    return None, f"Unknown question {question_id}"
+                if option is not None and (
+                    not isinstance(option, int) or isinstance(option, bool) or not 0 <= option < len(self.option_scores[position])
+                ):
+                    return None, f"Invalid option for question {question_id}"
+                options[position] = option
+                answered.add(position)
+            if len(answered) != len(self.questions):
+                return None, "Incomplete answers"
+            return options, None
+
+        if not isinstance(answers, list):
+            return None, "Invalid input"
+        if len(answers) != len(self.questions):
+            return None, "Incomplete answers"
+        return self.translate(answers), None
+
+    # Legacy option texts -> option positions
+    def translate(self, answers):
+        return [
+            lookup(answer) if isinstance(answer, str) else None
+            for lookup, answer in zip(self._option_lookups, answers)
+        ]
+
+    # Score chosen option positions by direct lookup
+    def score_options(self, options):
+        category_scores = dict.fromkeys(self.categories, 0)
+        total_score = 0
+
+        for scores, category, option in zip(self.option_scores, self.question_categories, options):
+            if option is not None:
+                total_score += scores[option]
+                category_scores[category] += scores[option]
+
+        return total_score, category_scores
+
+    # Score a full list of answers (option texts, in question order)
+    def score(self, answers):
+        return self.score_options(self.translate(answers))
+
+    # Keyed form of chosen options, as stored: {question_id: option position}
+    def keyed_answers(self, options):
+        return {q["id"]: option for q, option in zip(self.questions, options)}
+
+    # Option texts in this language for chosen option positions
+    def answer_texts(self, options):
+        return [
+            q["options"][option]["text"] if option is not None else None
+            for q, option in zip(self.questions, options)
+        ]
+
+    # Recommendation attached to the option chosen for question `position`
+    def recommendation_for(self, position, answer, default=None):
+        option = self.option_positions[position].get(answer) if isinstance(answer, str) else None
+        return self.questions[position]["options"][option]["recommendation"] if option is not None else default
+
+
+# All languages compiled from one parsed question bank
+class QuestionCatalog(_ReadOnly):
+    def __init__(self, raw_questions, languages=None, version=None, payloads=None):
+        if languages is None:
+            languages = discover_languages(raw_questions)
+        self.languages = MappingProxyType({
+            lang: LanguageCatalog(lang, raw_questions, payloads[lang] if payloads else None) for lang in languages
+        })
+        self.version = version
+        self._freeze()
+
+    def language(self, lang):
+        if lang not in self.languages:
+            lang = DEFAULT_LANGUAGE  # Default to English if unsupported language is requested
+        return self.languages[lang]
+
+
+# Every {lang: text} field of a parsed question bank
+def localized_fields(raw_questions):
+    for q in raw_questions:
+        if isinstance(q, dict):
+            yield q.get("category")
+            yield q.get("text")
+            for opt in q.get("options") or ():
+                if isinstance(opt, dict):
+                    yield opt.get("text")
+                    yield opt.get("recommendation")
+
+
+# Languages with a text in every field of the bank, in order of appearance;
+# languages that are only partly translated are left out
+def discover_languages(raw_questions):
+    seen = {}
+    complete = None
+    for field in localized_fields(raw_questions):
+        present = [lang for lang, text in field.items() if isinstance(text, str)] if isinstance(field, dict) else []
+        seen.update(dict.fromkeys(present))
+        complete = set(present) if complete is None else complete & set(present)
+    languages = tuple(lang for lang in seen if lang in (complete or ()))
+    partial = [lang for lang in seen if lang not in languages]
+    if partial:
+        logger.warning("Ignoring languages without a text in every field: %s", ", ".join(partial))
+    return languages
+
+
+# Check the structure of a parsed question bank before it is compiled; returns its languages
+def validate_questions(raw_questions, languages=None):
+    if not isinstance(raw_questions, list) or not raw_questions:
+        raise ValueError("Question bank must be a non-empty list")
+    if languages is None:
+        languages = discover_languages(raw_questions)
+    if DEFAULT_LANGUAGE not in languages:
+        raise ValueError(f"Question bank must have a text in {DEFAULT_LANGUAGE} for every field")
+
+    def check_localized(value, where):
+        if not isinstance(value, dict) or any(not isinstance(value.get(lang), str) for lang in languages):
+            raise ValueError(f"{where} must have a text for each of {', '.join(languages)}")
+
+    seen_ids = set()
+    # Category key -> its name in each language, which must be the same everywhere
+    category_names = {}
+    for position, q in enumerate(raw_questions):
+        where = f"Question #{position + 1}"
+        if not isinstance(q, dict) or "id" not in q:
+            raise ValueError(f"{where} has no id")
+        if not isinstance(q["id"], (int, str)) or isinstance(q["id"], bool):
+            raise ValueError(f"{where} id must be a number or a string")
+        if q["id"] in seen_ids:
+            raise ValueError(f"{where} reuses id {q['id']}")
+        seen_ids.add(q["id"])
+        check_localized(q.get("category"), f"{where} category")
+        names = category_names.setdefault(q["category"][DEFAULT_LANGUAGE], {lang: q["category"][lang] for lang in languages})
+        for lang in languages:
+            if q["category"][lang] != names[lang]:
+                raise ValueError(
+                    f"{where} names category '{q['category'][DEFAULT_LANGUAGE]}' '{q['category'][lang]}' in {lang}, "
+                    f"but earlier questions call it '{names[lang]}'"
+                )
+        check_localized(q.get("text"), f"{where} text")
+        if not isinstance(q.get("options"), list) or not q["options"]:
+            raise ValueError(f"{where} has no options")
+        for opt in q["options"]:
+            check_localized(opt.get("text"), f"{where} option text")
+            check_localized(opt.get("recommendation"), f"{where} option recommendation")
+            if not isinstance(opt.get("score"), (int, float)) or isinstance(opt["score"], bool):
+                raise ValueError(f"{where} option score must be a number")
+
+    # Names must also lead back to a single category
+    for lang in languages:
+        keys = {}
+        for key, names in category_names.items():
+            other = keys.setdefault(names[lang], key)
+            if other != key:
+                raise ValueError(f"Categories '{other}' and '{key}' are both called '{names[lang]}' in {lang}")
+    return languages
+
+
+# Function to load, validate and compile the question bank from disk. When the
+# compiled question bank was built from this exact JSON it is used instead,
+# skipping parsing, validation and payload encoding.
+def load_catalog(path=QUESTIONS_PATH, compiled_path=COMPILED_QUESTIONS_PATH):
+    with open(path, "rb") as f:
+        content = f.read()
+    checksum = hashlib.sha256(content)
+    # The version id is derived from the file content, so identical files share it
+    version = checksum.hexdigest()[:12]
+
+    bank = load_compiled(compiled_path, checksum.digest()) if compiled_path else None
+    if bank is not None:
+        payloads = {lang: EncodedPayload.from_variants(variants) for lang, variants in bank.payloads.items()}
+        return QuestionCatalog(bank.raw_questions, bank.languages, version, payloads)
+
+    raw_questions = json.loads(content.decode("utf-8"))
+    languages = validate_questions(raw_questions)
+    return QuestionCatalog(raw_questions, languages, version)
+
+
+# Compiled question bank for the given JSON checksum, or None if it is missing,
+# unreadable or was built from another version of the JSON
+def load_compiled(compiled_path, source_sha256):
+    if not os.path.exists(compiled_path):
+        return None
+    # The compiled bank is only a faster way to load the JSON, so whatever goes
+    # wrong reading it, the JSON is loaded instead
+    try:
+        bank = read_question_bank(compiled_path)
+    except Exception as e:
+        logger.warning("Ignoring compiled question bank %s: %s: %s", compiled_path, type(e).__name__, e)
+        return None
+    if bank.source_sha256 != source_sha256:
+        logger.warning("Compiled question bank %s is out of date, loading the JSON instead", compiled_path)
+        return None
+    return bank
+
+
+# Validate and compile questions.json, and write it to `compiled_path` in binary form
+def compile_question_bank(path=QUESTIONS_PATH, compiled_path=COMPILED_QUESTIONS_PATH):
+    with open(path, "rb") as f:
+        content = f.read()
+    raw_questions = json.loads(content.decode("utf-8"))
+    languages = validate_questions(raw_questions)
+    catalog = QuestionCatalog(raw_questions, languages)
+    payloads = {lang: questions.questions_payload.variants for lang, questions in catalog.languages.items()}
+    data = build_question_bank(raw_questions, tuple(catalog.languages), payloads, content)
+
+    # Write next to the target and rename, so readers never see a partial file
+    tmp_path = f"{compiled_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, compiled_path)
+    return len(data)
+
+
+# Polls questions.json and hands a freshly compiled catalog to `on_reload` when it changes
+class CatalogWatcher:
+    def __init__(self, on_reload, path=QUESTIONS_PATH, interval=2.0, languages=()):
+        self.on_reload = on_reload
+        self.path = path
+        self.interval = interval
+        # Languages of the catalog being served, which a reload must keep
+        self.languages = tuple(languages)
+        self._signature = self._stat()
+        self._failed_signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    # Also restarts the thread in a forked child, where only the forking thread survives
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait=False):
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    # Reload once if the file changed; a broken file keeps the current catalog in
+    # place, and so does one that leaves out a language being served (e.g. a single
+    # missing translation), since its clients would silently fall back to English
+    def check(self):
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            new_catalog = load_catalog(self.path)
+            missing = [lang for lang in self.languages if lang not in new_catalog.languages]
+            if missing:
+                raise ValueError(f"it no longer has every text in {', '.join(missing)}")
+        except (OSError, ValueError) as e:
+            if signature != self._failed_signature:
+                logger.error("Ignoring invalid question bank %s: %s", self.path, e)
+                self._failed_signature = signature
+            return False
+        self._signature = signature
+        self.languages = tuple(new_catalog.languages)
+        self.on_reload(new_catalog)
+        logger.info("Question bank reloaded, version %s", new_catalog.version)
+        return True
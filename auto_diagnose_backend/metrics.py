@@ -0,0 +1,223 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text exposition format served by /metrics
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; scoring takes tens of microseconds while a PDF takes tens of milliseconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Monotonic counter, optionally split by labels
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name + "_total", _labels(self.labelnames, key), value) for key, value in values]
+
+
+# Cumulative histogram, optionally split by labels
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        samples = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", _labels(self.labelnames, key, [("le", _number(bound))]), cumulative))
+            samples.append((self.name + "_sum", _labels(self.labelnames, key), total))
+            samples.append((self.name + "_count", _labels(self.labelnames, key), count))
+        return samples
+
+
+# Gauge read at scrape time; `read` returns a number or a list of (labels dict, number)
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self):
+        value = self.read()
+        if not isinstance(value, list):
+            return [(self.name, "", value)]
+        return [(self.name, _labels(labels.keys(), labels.values()), v) for labels, v in value]
+
+
+# Counter kept elsewhere (e.g. by a cache) and read at scrape time, like a Gauge
+class CounterFunc(Gauge):
+    kind = "counter"
+
+    def samples(self):
+        return [(name + "_total", labels, value) for name, labels, value in super().samples()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    # Add a metric, or return the one already registered under that name
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read):
+        return self.register(Gauge(name, documentation, read))
+
+    def counter_func(self, name, documentation, read):
+        return self.register(CounterFunc(name, documentation, read))
+
+    def exposition(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                logger.exception("Could not collect metric %s", metric.name)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram(
+    "auto_diagnose_span_seconds", "Time spent in each step of the request hot path.", ["span"]
+)
+
+_capture = threading.local()
+
+# Time a block of the hot path. Inside capture_spans() the timing is collected
+# instead of recorded, so a worker process can send it back to the server.
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        captured = getattr(_capture, "spans", None)
+        if captured is not None:
+            captured.append((name, elapsed))
+        else:
+            SPAN_SECONDS.observe(elapsed, span=name)
+
+
+@contextmanager
+def capture_spans():
+    previous = getattr(_capture, "spans", None)
+    _capture.spans = spans = []
+    try:
+        yield spans
+    finally:
+        _capture.spans = previous
+
+
+# Record timings captured elsewhere, e.g. in a render worker
+def record_spans(spans):
+    for name, elapsed in spans:
+        SPAN_SECONDS.observe(elapsed, span=name)
+
+
+# Logging filter letting through at most one record per distinct message every
+# `interval` seconds; the next identical record that passes says how many were dropped
+class RateLimitFilter(logging.Filter):
+    # Messages tracked before the ones not seen for `interval` are forgotten
+    MAX_TRACKED = 1024
+
+    def __init__(self, interval=10.0):
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            if len(self._last) >= self.MAX_TRACKED and key not in self._last:
+                self._last = {k: v for k, v in self._last.items() if now - v[0] < self.interval}
+            last, suppressed = self._last.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._last[key] = (last, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        record.suppressed = suppressed
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
@@ -0,0 +1,94 @@
+import os
+import threading
+
+# Percentages are bucketed to 0.01, the precision /api/submit reports them in
+BUCKETS_PER_POINT = 100
+BUCKET_COUNT = 100 * BUCKETS_PER_POINT + 1
+
+
+def bucket(percentage):
+    return min(max(int(round(percentage * BUCKETS_PER_POINT)), 0), BUCKET_COUNT - 1)
+
+
+# Distribution of percentages as bucket counts in a Fenwick tree, so adding a
+# score and counting the scores below a value both take O(log buckets)
+class PercentileSketch:
+    def __init__(self):
+        self.tree = [0] * (BUCKET_COUNT + 1)
+        self.total = 0
+
+    def add(self, percentage):
+        self.total += 1
+        index = bucket(percentage) + 1
+        while index <= BUCKET_COUNT:
+            self.tree[index] += 1
+            index += index & -index
+
+    # Number of scores in buckets below `end`
+    def _count_below(self, end):
+        count = 0
+        while end > 0:
+            count += self.tree[end]
+            end -= end & -end
+        return count
+
+    # Percentile rank of a percentage: share of scores below it, counting ties as half
+    def rank(self, percentage):
+        if self.total == 0:
+            return None
+        b = bucket(percentage)
+        below = self._count_below(b)
+        equal = self._count_below(b + 1) - below
+        return round((below + equal / 2) / self.total * 100, 2)
+
+
+# Percentile ranks against every stored submission. The sketches follow the
+# database: each lookup first folds in the rows added since the last one (by any
+# worker process), found through the rowid, so nothing is ever rescanned.
+# Submissions are never deleted, which keeps the rowids growing.
+class ScoreBenchmark:
+    def __init__(self, store):
+        self.store = store
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset(self):
+        self.overall = PercentileSketch()
+        self.categories = {}
+        self._submission_rowid = 0
+        self._category_rowid = 0
+        self._lock = threading.Lock()
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    # Fold in new submissions; categories are stored with their stable key, so the
+    # same category submitted in different languages shares one sketch
+    def sync(self):
+        with self._lock:
+            scores, category_scores = self.store.scores_since(self._submission_rowid, self._category_rowid)
+            for rowid, percentage in scores:
+                self.overall.add(percentage)
+                self._submission_rowid = rowid
+            for rowid, key, percentage in category_scores:
+                sketch = self.categories.get(key)
+                if sketch is None:
+                    sketch = self.categories[key] = PercentileSketch()
+                sketch.add(percentage)
+                self._category_rowid = rowid
+
+    # Ranks of one result (in the shape of /api/submit) within the stored population
+    def ranks(self, questions, result):
+        self.sync()
+        category_percentiles = {}
+        for category, score in result["category_scores"].items():
+            max_score = result["category_max_scores"].get(category, 0)
+            sketch = self.categories.get(questions.category_keys.get(category, category))
+            if max_score > 0 and sketch is not None:
+                category_percentiles[category] = sketch.rank((score / max_score) * 100)
+        return {
+            "population": self.overall.total,
+            "percentile": self.overall.rank(result["percentage_score"]),
+            "category_percentiles": category_percentiles,
+        }
@@ -0,0 +1,63 @@
+from collections import Counter
+import sys
+import threading
+
+
+# Statistical profiler: a background thread samples the stack of every other
+# thread at a fixed interval and counts identical stacks. The counts are kept
+# in the "folded" format (frame;frame;frame count) that flame graph tools read.
+class SamplingProfiler:
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Also restarts the thread in a forked child, which starts a collection of its own
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._lock = threading.Lock()
+            self._stacks = Counter()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=False):
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = [self._stack(frame) for ident, frame in frames.items() if ident != own]
+            with self._lock:
+                self._stacks.update(stack for stack in stacks if stack)
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    # Threads blocked waiting for work are sampled too; drop stacks that only
+    # ever sit in these calls so the busy paths stand out
+    IDLE = ("wait (threading.py", "select (selectors.py", "_worker (thread.py", "accept (socket.py")
+
+    def folded(self, include_idle=False):
+        with self._lock:
+            stacks = self._stacks.most_common()
+        lines = [
+            f"{stack} {count}" for stack, count in stacks
+            if include_idle or not stack.rsplit(";", 1)[-1].startswith(self.IDLE)
+        ]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
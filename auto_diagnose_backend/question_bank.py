@@ -0,0 +1,207 @@
+import hashlib
+import json
+import struct
+
+# Compiled question bank: the questions of every language in one binary file,
+# plus the pre-encoded /api/questions bodies. questions.json stays the source;
+# the file records the SHA-256 of the JSON it was built from, so a stale build
+# is detected and ignored.
+#
+# Layout (little-endian), after the header:
+#   strings    u32 count, u32 offsets[count + 1], UTF-8 blob. Every distinct
+#              text is stored once and referred to by its index.
+#   languages  u16 count, u32 string[count]
+#   questions  u32 count, then per question: u32 extras (JSON of the fields other
+#              than category/text/options), u32 first option, u16 option count,
+#              and per language u32 category, u32 text
+#   options    u32 count, then per option: f64 score, u8 integral flag, and per
+#              language u32 text, u32 recommendation
+#   payloads   per language: u8 count, then per encoding: u32 name, u32 offset,
+#              u32 length; the offsets point into the blob that ends the file
+
+MAGIC = b"ADQB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHH32s32sI")  # magic, format version, reserved, source sha256, body sha256, body length
+
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+PAYLOAD_ENTRY = struct.Struct("<III")
+
+
+def question_struct(language_count):
+    return struct.Struct("<IIH" + "II" * language_count)
+
+
+def option_struct(language_count):
+    return struct.Struct("<dB" + "II" * language_count)
+
+
+# Raised for files that are not a compiled question bank or are corrupted
+class QuestionBankError(ValueError):
+    pass
+
+
+class StringTable:
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def add(self, text):
+        position = self.index.get(text)
+        if position is None:
+            position = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return position
+
+    def encode(self):
+        blobs = [text.encode("utf-8") for text in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return U32.pack(len(blobs)) + struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(blobs)
+
+
+# Serialize a parsed, validated question bank and the payloads compiled from it
+# (lang -> {encoding: bytes}); `source` is the content of the JSON file
+def build_question_bank(raw_questions, languages, payloads, source):
+    strings = StringTable()
+    question_entry = question_struct(len(languages))
+    option_entry = option_struct(len(languages))
+
+    language_ids = [strings.add(lang) for lang in languages]
+
+    questions = []
+    options = []
+    for q in raw_questions:
+        extras = {key: value for key, value in q.items() if key not in ("category", "text", "options")}
+        localized = []
+        for lang in languages:
+            localized += [strings.add(q["category"][lang]), strings.add(q["text"][lang])]
+        questions.append(question_entry.pack(
+            strings.add(json.dumps(extras, ensure_ascii=False, sort_keys=True)), len(options), len(q["options"]), *localized
+        ))
+        for opt in q["options"]:
+            localized = []
+            for lang in languages:
+                localized += [strings.add(opt["text"][lang]), strings.add(opt["recommendation"][lang])]
+            options.append(option_entry.pack(float(opt["score"]), isinstance(opt["score"], int), *localized))
+
+    payload_table = []
+    blobs = []
+    blob_size = 0
+    for lang in languages:
+        variants = payloads[lang]
+        payload_table.append(U8.pack(len(variants)))
+        for encoding, data in variants.items():
+            payload_table.append(PAYLOAD_ENTRY.pack(strings.add(encoding), blob_size, len(data)))
+            blobs.append(data)
+            blob_size += len(data)
+
+    body = b"".join([
+        strings.encode(),
+        U16.pack(len(language_ids)), *(U32.pack(i) for i in language_ids),
+        U32.pack(len(questions)), *questions,
+        U32.pack(len(options)), *options,
+        *payload_table,
+        *blobs,
+    ])
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, hashlib.sha256(source).digest(), hashlib.sha256(body).digest(), len(body))
+    return header + body
+
+
+# A compiled question bank read back from disk
+class QuestionBank:
+    def __init__(self, source_sha256, languages, raw_questions, payloads):
+        self.source_sha256 = source_sha256
+        self.languages = languages
+        self.raw_questions = raw_questions
+        self.payloads = payloads
+
+
+# Sequential reader over the mapped file
+class _Cursor:
+    def __init__(self, view, offset):
+        self.view = view
+        self.offset = offset
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.view, self.offset)
+        self.offset += layout.size
+        return values
+
+    def unpack_many(self, layout, count):
+        end = self.offset + layout.size * count
+        values = list(layout.iter_unpack(self.view[self.offset:end]))
+        self.offset = end
+        return values
+
+
+# Read a compiled question bank. What it saves over the JSON is parsing: the
+# tables are unpacked with struct instead of json, and the texts come back as one
+# str object each, shared by all questions and languages that use them.
+def read_question_bank(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return _parse(data)
+    except struct.error as e:
+        raise QuestionBankError(f"Truncated question bank: {e}") from e
+
+
+def _parse(data):
+    if len(data) < HEADER.size:
+        raise QuestionBankError("File is too short to be a compiled question bank")
+    magic, version, _, source_sha256, body_sha256, body_length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise QuestionBankError("Not a compiled question bank")
+    if version != FORMAT_VERSION:
+        raise QuestionBankError(f"Unsupported question bank format {version}")
+    body = memoryview(data)[HEADER.size:HEADER.size + body_length]
+    if len(body) != body_length or hashlib.sha256(body).digest() != body_sha256:
+        raise QuestionBankError("Question bank checksum mismatch")
+
+    cursor = _Cursor(body, 0)
+    (string_count,) = cursor.unpack(U32)
+    offsets = cursor.unpack_many(U32, string_count + 1)
+    blob = bytes(body[cursor.offset:cursor.offset + offsets[-1][0]])
+    cursor.offset += offsets[-1][0]
+    strings = [blob[start:end].decode("utf-8") for (start,), (end,) in zip(offsets, offsets[1:])]
+
+    (language_count,) = cursor.unpack(U16)
+    languages = tuple(strings[i] for (i,) in cursor.unpack_many(U32, language_count))
+
+    (question_count,) = cursor.unpack(U32)
+    question_rows = cursor.unpack_many(question_struct(language_count), question_count)
+    (option_count,) = cursor.unpack(U32)
+    option_rows = cursor.unpack_many(option_struct(language_count), option_count)
+
+    def localized(ids):
+        return {lang: strings[i] for lang, i in zip(languages, ids)}
+
+    raw_questions = []
+    for extras, first_option, count, *texts in question_rows:
+        options = []
+        for score, integral, *option_texts in option_rows[first_option:first_option + count]:
+            options.append({
+                "text": localized(option_texts[0::2]),
+                "score": int(score) if integral else score,
+                "recommendation": localized(option_texts[1::2]),
+            })
+        raw_questions.append({
+            **json.loads(strings[extras]),
+            "category": localized(texts[0::2]),
+            "text": localized(texts[1::2]),
+            "options": options,
+        })
+
+    entries = {}
+    for lang in languages:
+        (variant_count,) = cursor.unpack(U8)
+        entries[lang] = cursor.unpack_many(PAYLOAD_ENTRY, variant_count)
+    blob_start = cursor.offset
+    payloads = {
+        lang: {strings[name]: bytes(body[blob_start + offset:blob_start + offset + length]) for name, offset, length in rows}
+        for lang, rows in entries.items()
+    }
+    return QuestionBank(source_sha256, languages, raw_questions, payloads)
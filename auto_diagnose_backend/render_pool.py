@@ -0,0 +1,187 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import os
+import signal
+import threading
+import time
+import uuid
+
+from metrics import capture_spans, record_spans
+from report import get_report_assets, render_report
+
+
+# Raised when the pool already holds as many reports as it is allowed to queue
+class PoolBusy(Exception):
+    pass
+
+
+# Worker start-up: parse fonts and images once per process (a no-op when the
+# worker was forked from a parent that already loaded them)
+def _init_worker():
+    # Forked workers inherit the server's shutdown handlers; the pool is stopped
+    # through its queue, and Ctrl+C is for the server to handle
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_report_assets()
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+
+
+# A worker whose server process was killed outright would otherwise wait for
+# work on the task pipe forever; exit once the parent is gone
+def _exit_with_parent(parent, interval=1.0):
+    while os.getppid() == parent:
+        time.sleep(interval)
+    os._exit(1)
+
+
+# Runs in a worker: the PDF goes back together with the timings of each step,
+# including how long the report waited for a free worker
+def _render(report, submitted):
+    with capture_spans() as spans:
+        spans.append(("render_queue_wait", max(0.0, time.time() - submitted)))
+        pdf_bytes = render_report(report)
+    return pdf_bytes, spans
+
+
+# Future for the PDF bytes of a pool job; worker timings are recorded in this
+# process once the job finishes
+class RenderFuture(Future):
+    def __init__(self, job):
+        super().__init__()
+        self._job = job
+        job.add_done_callback(self._finish)
+
+    def running(self):
+        return not self.done() and self._job.running()
+
+    # Also drops the job if no worker has picked it up yet
+    def cancel(self):
+        self._job.cancel()
+        return super().cancel()
+
+    def _finish(self, job):
+        if self.done():
+            return
+        if job.cancelled():
+            self.cancel()
+        elif job.exception() is not None:
+            self.set_exception(job.exception())
+        else:
+            pdf_bytes, spans = job.result()
+            record_spans(spans)
+            self.set_result(pdf_bytes)
+
+
+# Bounded process pool for CPU-bound PDF rendering. At most `processes` reports
+# render at once and at most `queue_size` more wait for a free worker; beyond
+# that submit() raises PoolBusy instead of letting the backlog grow.
+class RenderPool:
+    def __init__(self, processes=2, queue_size=16):
+        self.processes = processes
+        self.capacity = processes + queue_size
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker)
+            return self._executor
+
+    # A worker that died (OOM kill, crash in fpdf or PIL) breaks the whole executor
+    # for good; drop it so the next report starts a fresh one
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, executor, job):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        if not job.cancelled() and isinstance(job.exception(), BrokenProcessPool):
+            self._discard(executor)
+
+    # Raises BrokenProcessPool, here or from the future, when a worker died; the
+    # reports caught in it fail, and the ones submitted after it get new workers
+    def submit(self, report):
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy("Report rendering queue is full")
+        executor = None
+        try:
+            executor = self._get_executor()
+            job = executor.submit(_render, report, time.time())
+        except Exception as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        with self._lock:
+            self._in_flight += 1
+        job.add_done_callback(partial(self._release, executor))
+        return RenderFuture(job)
+
+    def stats(self):
+        with self._lock:
+            return {"processes": self.processes, "in_flight": self._in_flight, "capacity": self.capacity}
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+# Asynchronous report jobs: id -> future plus what is needed to send the file
+class ReportJobs:
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def add(self, future, download_name):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = {"future": future, "download_name": download_name, "created": time.time(), "finished": None}
+        future.add_done_callback(lambda _f: self._mark_finished(job_id))
+        return job_id
+
+    # A job whose result is already known, e.g. served from the report cache
+    def add_done(self, pdf_bytes, download_name):
+        future = Future()
+        future.set_result(pdf_bytes)
+        return self.add(future, download_name)
+
+    def _mark_finished(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["finished"] = time.time()
+
+    # Forget jobs whose result has been available for longer than the TTL
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["finished"] and job["finished"] < cutoff]:
+            del self._jobs[job_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def status(job):
+        future = job["future"]
+        if not future.done():
+            return "running" if future.running() else "queued"
+        return "failed" if future.cancelled() or future.exception() is not None else "done"
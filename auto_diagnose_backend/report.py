@@ -0,0 +1,483 @@
+from collections import OrderedDict
+from fpdf import FPDF
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+
+from metrics import span
+
+# Obtém o diretório base do script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_DIR = os.path.join(BASE_DIR, "fonts")
+
+# Caminhos completos das fontes
+FONT_PATH = os.path.join(FONT_DIR, "DejaVuSans.ttf")
+FONT_PATH_BOLD = os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf")
+IMAGE_DIR = os.path.join(BASE_DIR, "images")
+
+logger = logging.getLogger(__name__)
+
+# Recommended cybersecurity tools, by category key (the English category name)
+TOOL_RECOMMENDATIONS = {
+    "Access Control": ["Okta", "Microsoft Entra ID (Azure AD)"],
+    "Asset Management": ["Snipe-IT", "Lansweeper"],
+    "Business Continuity": ["Veeam Backup & Replication", "Azure Site Recovery"],
+    "Compliance": ["OpenSCAP", "Wazuh"],
+    "Data Protection": ["VeraCrypt", "BitLocker"],
+    "Employee Awareness and Training": ["KnowBe4", "Infosec IQ"],
+    "Governance and Policies": ["NIST Cybersecurity Framework", "CIS Controls"],
+    "Incident Response": ["TheHive", "Velociraptor"],
+    "Incident Response and Recovery": ["Splunk SOAR", "IBM Resilient"],
+    "Network Security": ["Snort", "Wireshark"],
+    "Risk Management": ["NIST Risk Management Framework", "Eramba"],
+    "Security Awareness": ["KnowBe4", "GoPhish"],
+    "Third-Party Risk Management": ["OneTrust", "Prevalent"],
+}
+
+# Report texts per language; languages without an entry get the English ones
+REPORT_TEXT = {
+    "en": {
+        "title": "Cybersecurity Diagnostic Report",
+        "category_breakdown": "Category Breakdown",
+        "recommendations": "Recommendations",
+        "suggested_tools": "Suggested Tools for Improvement",
+        "no_recommendation": "No specific recommendation",
+        "download_name": "cybersecurity_diagnostic_report.pdf",
+        "weak_areas": "Focus on strengthening key areas: {categories}.",
+        "no_weak_areas": "Good job! No major weaknesses detected.",
+    },
+    "pt": {
+        "title": "Relatório de Diagnóstico de Cibersegurança",
+        "category_breakdown": "Desempenho por Categoria",
+        "recommendations": "Recomendações",
+        "suggested_tools": "Ferramentas Recomendadas",
+        "no_recommendation": "Sem recomendação específica",
+        "download_name": "diagnostico_ciberseguranca.pdf",
+        "weak_areas": "Foque-se em fortalecer as seguintes áreas: {categories}.",
+        "no_weak_areas": "Bom trabalho! Nenhuma fraqueza detectada.",
+    },
+}
+
+
+def report_text(lang):
+    return REPORT_TEXT.get(lang, REPORT_TEXT["en"])
+
+
+# Derive everything the PDF shows from the answers and the client's category scores.
+# The result is plain data, so it can be hashed, cached or sent to another process.
+def prepare_report(questions, lang, answers, category_scores, category_max_scores):
+    # Calculate category percentages
+    category_percentages = {
+        category: (score / category_max_scores[category]) * 100 if category_max_scores[category] > 0 else 0
+        for category, score in category_scores.items()
+    }
+
+    # Identify weak categories by their stable key, whatever language the scores were named in
+    weak_categories = [
+        questions.category_keys.get(category, category) for category, percentage in category_percentages.items() if percentage < 50
+    ]
+
+    # Extract recommendations based on answers
+    extracted_recommendations = {}
+    for idx, answer in enumerate(answers):
+        if idx < len(questions):  # Ensure index is within range
+            category = questions.question_categories[idx]
+
+            # Find the corresponding recommendation in the selected language
+            recommendation = questions.recommendation_for(idx, answer, report_text(lang)["no_recommendation"])
+
+            if category not in extracted_recommendations:
+                extracted_recommendations[category] = []
+            extracted_recommendations[category].append(f"• {recommendation}")
+
+    # Filter suggested tools based on weak categories, shown under their name in the report's language
+    suggested_tools = {
+        questions.category_names.get(key, key): TOOL_RECOMMENDATIONS.get(key, []) for key in weak_categories
+    }
+
+    return {
+        "lang": lang,
+        "category_scores": [
+            [category, score, category_max_scores.get(category, "N/A"), category_percentages[category]]
+            for category, score in category_scores.items()
+        ],
+        "recommendations": list(extracted_recommendations.items()),
+        "weak_categories": weak_categories,
+        "suggested_tools": list(suggested_tools.items()),
+    }
+
+
+# Canonical fingerprint of a prepared report for a given question bank version
+def report_cache_key(version, report):
+    canonical = json.dumps([version, report], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# FPDF with a faster width table: fpdf keeps the used characters in a list with
+# duplicates, which makes its membership test per glyph very slow for long reports
+class ReportDocument(FPDF):
+    def _putTTfontwidths(self, font, maxUni):
+        super()._putTTfontwidths(dict(font, subset=set(font["subset"])), maxUni)
+
+
+# Fonts and images parsed once per process and shared by every report. Each
+# document gets its own copies of the per-document bookkeeping (object index,
+# character subset), while font metrics and image streams are shared.
+class ReportAssets:
+    # Layout state left behind by the cover page, restored when it is replayed
+    COVER_STATE = ("x", "y", "lasth", "ws", "font_family", "font_style", "font_size_pt", "font_size", "underline", "unifontsubset")
+
+    # png_cache=False decodes the images every time, as before they were cached
+    def __init__(self, font_path=FONT_PATH, font_path_bold=FONT_PATH_BOLD, image_dir=IMAGE_DIR, png_cache=True):
+        self.background_image = os.path.join(image_dir, "background.png")
+        self.logo_image = os.path.join(image_dir, "logo_hq.png")
+
+        # ✅ Load Fonts
+        probe = FPDF()
+        try:
+            probe.add_font("DejaVu", "", os.path.abspath(font_path), uni=True)
+            probe.add_font("DejaVu", "B", os.path.abspath(font_path_bold), uni=True)
+        except Exception:
+            logger.exception("Error loading fonts from %s", os.path.dirname(font_path))
+            raise
+        self.fonts = probe.fonts
+        self.font_files = probe.font_files
+
+        self.images = {path: load_png(probe, path, png_cache) for path in (self.background_image, self.logo_image)}
+        # Images with an alpha channel raise the document to PDF 1.4
+        self.pdf_version = probe.pdf_version
+
+        self._covers = {}
+        self._lock = threading.Lock()
+
+    def _blank_document(self):
+        pdf = ReportDocument()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        for key, font in self.fonts.items():
+            pdf.fonts[key] = dict(font, i=len(pdf.fonts) + 1, subset=list(font["subset"]))
+        for key, info in self.font_files.items():
+            pdf.font_files[key] = dict(info)
+        pdf.set_font("DejaVu", "", 12)
+        return pdf
+
+    def _install_image(self, pdf, path):
+        if path not in pdf.images:
+            pdf.images[path] = dict(self.images[path], i=len(pdf.images) + 1)
+            pdf.pdf_version = max(pdf.pdf_version, self.pdf_version)
+
+    # Same as pdf.image(), but reusing the already decoded image stream
+    def image(self, pdf, path, **kwargs):
+        self._install_image(pdf, path)
+        pdf.image(path, **kwargs)
+
+    def _layout_cover(self, pdf, lang):
+        # ✅ **Front Page**
+        pdf.add_page()
+        self.image(pdf, self.background_image, x=0, y=0, w=210, h=297)
+
+        pdf.set_font("DejaVu", "B", size=22)  # Reduced font size to fit within width
+        pdf.set_y(80)  # Adjust position
+
+        # ✅ Use `multi_cell()` to avoid overflow
+        pdf.multi_cell(190, 10, txt=report_text(lang)["title"], align="C")
+
+        pdf.set_y(120)
+        pdf.set_font("DejaVu", size=14)
+        pdf.cell(0, 10, txt="Report Date: 2025", ln=True, align="C")
+
+        # ✅ Centering the logo properly
+        self.image(pdf, self.logo_image, x=(210-50)/2, y=180, w=50)
+
+        self.image(pdf, self.logo_image, x=80, y=180, w=50)
+
+    # Lay out the cover once and keep its content stream and layout state
+    def _cover(self, lang):
+        cover = self._covers.get(lang)
+        if cover is None:
+            with span("report_cover_layout"):
+                pdf = self._blank_document()
+                self._layout_cover(pdf, lang)
+            cover = {
+                "content": pdf.pages[1],
+                "images": sorted(pdf.images, key=lambda path: pdf.images[path]["i"]),
+                "subsets": {key: list(font["subset"]) for key, font in pdf.fonts.items()},
+                "font": pdf.current_font["fontkey"],
+                "state": {attr: getattr(pdf, attr) for attr in self.COVER_STATE},
+            }
+            with self._lock:
+                cover = self._covers.setdefault(lang, cover)
+        return cover
+
+    # A new document with the cover page already in place
+    def new_document(self, lang):
+        cover = self._cover(lang)
+        pdf = self._blank_document()
+        for path in cover["images"]:
+            self._install_image(pdf, path)
+
+        pdf.add_page()
+        pdf.pages[1] = cover["content"]
+        for key, subset in cover["subsets"].items():
+            pdf.fonts[key]["subset"] = list(subset)
+        for attr, value in cover["state"].items():
+            setattr(pdf, attr, value)
+        pdf.current_font = pdf.fonts[cover["font"]]
+        return pdf
+
+
+# fpdf decodes PNGs in pure Python (seconds for the background image), so the
+# decoded stream is cached next to the image, like fpdf's own font metric
+# caches; the cache is keyed by the image content, so replacing it is safe
+def load_png(pdf, path, use_cache=True):
+    with open(path, "rb") as f:
+        checksum = hashlib.sha256(f.read()).hexdigest()
+    cache_path = path + ".pkl"
+    if use_cache:
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached["sha256"] == checksum:
+                pdf.pdf_version = max(pdf.pdf_version, cached["pdf_version"])
+                return cached["info"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Truncated or corrupt: decode the image again and rewrite the cache
+            logger.warning("Ignoring unreadable image cache %s: %s: %s", cache_path, type(e).__name__, e)
+
+    # Decode on a fresh document to learn the PDF version this image alone needs
+    decoder = FPDF()
+    info = decoder._parsepng(path)
+    pdf.pdf_version = max(pdf.pdf_version, decoder.pdf_version)
+    if not use_cache:
+        return info
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"sha256": checksum, "pdf_version": decoder.pdf_version, "info": info}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not cache decoded image %s: %s", path, e)
+    return info
+
+
+_report_assets = None
+_report_assets_lock = threading.Lock()
+
+# Process-wide assets, loaded on first use (or up front by calling this at startup)
+def get_report_assets():
+    global _report_assets
+    if _report_assets is None:
+        with _report_assets_lock:
+            if _report_assets is None:
+                with span("report_assets_load"):
+                    _report_assets = ReportAssets()
+    return _report_assets
+
+
+# Lay out a prepared report; only the dynamic pages are laid out here
+def layout_report(report, assets=None):
+    lang = report["lang"]
+    pdf = (assets or get_report_assets()).new_document(lang)
+
+    # ✅ Add Category Breakdown
+    pdf.add_page()
+    pdf.set_font("DejaVu", "B", size=18)
+    pdf.cell(0, 10, txt=report_text(lang)["category_breakdown"], ln=True)
+    pdf.ln(5)
+
+    pdf.set_font("DejaVu", size=12)
+    for category, score, max_cat_score, percentage in report["category_scores"]:
+        pdf.cell(200, 10, txt=f"{category}: {score}/{max_cat_score} ({round(percentage, 2)}%)", ln=True)
+
+    pdf.ln(10)
+
+    # ✅ **Recommendations**
+    pdf.add_page()
+    pdf.set_font("DejaVu", "B", size=18)
+    pdf.cell(0, 10, txt=report_text(lang)["recommendations"], ln=True)
+    pdf.ln(5)
+
+    pdf.set_font("DejaVu", size=12)
+    for category, recs in report["recommendations"]:
+        pdf.set_font("DejaVu", style="B", size=14)
+        pdf.cell(0, 10, txt=category, ln=True)
+        pdf.ln(5)
+
+        pdf.set_font("DejaVu", size=12)
+        for rec in recs:
+            pdf.multi_cell(0, 8, rec)
+            pdf.ln(3)
+
+    pdf.ln(10)
+
+    suggested_tools = report["suggested_tools"]
+    if suggested_tools and any(tools for _, tools in suggested_tools):  # Ensure at least one tool exists
+        pdf.add_page()
+        pdf.set_font("DejaVu", "B", size=18)
+        pdf.cell(0, 10, txt=report_text(lang)["suggested_tools"], ln=True)
+        pdf.ln(5)
+
+        pdf.set_font("DejaVu", size=12)
+        for category, tools in suggested_tools:
+            if tools:  # Ensure there are tools before printing
+                pdf.set_font("DejaVu", "B", size=14)
+                pdf.cell(0, 10, txt=category, ln=True)
+                pdf.ln(3)
+                pdf.set_font("DejaVu", size=12)
+                for tool in tools:
+                    pdf.cell(0, 8, txt=f"• {tool}", ln=True)
+                pdf.ln(5)
+
+    return pdf
+
+
+# fpdf assembles the whole file as a latin-1 str; encode it once and drop the
+# uncompressed page contents and the str right away, so only the bytes stay alive
+def serialize_report(pdf):
+    document = pdf.output(dest="S")
+    pdf.pages.clear()
+    pdf.buffer = ""
+    return document.encode("latin1", "ignore")
+
+
+# Render a prepared report to PDF bytes
+def render_report(report, assets=None):
+    with span("pdf_layout"):
+        pdf = layout_report(report, assets)
+    with span("pdf_serialize"):
+        return serialize_report(pdf)
+
+
+# Content-addressed cache of rendered reports: an in-memory LRU capped by total
+# bytes, optionally spilling evicted entries to a directory on disk
+class ReportCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, spill_dir=None, spill_max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._spill_size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._prune_spill_dir()
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.pdf")
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.spill_dir:
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                # Reading a report makes it the newest, so pruning removes the least recently used
+                try:
+                    os.utime(self._spill_path(key))
+                except OSError:
+                    pass
+                with self._lock:
+                    self.disk_hits += 1
+                self.put(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            self._spill(key, data)
+            return
+
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                old_key, old_data = self._entries.popitem(last=False)
+                self._size -= len(old_data)
+                evicted.append((old_key, old_data))
+
+        for old_key, old_data in evicted:
+            self._spill(old_key, old_data)
+
+    # Write an entry to the spill directory (atomically, so readers never see half a file)
+    def _spill(self, key, data):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not spill report %s to disk: %s", key, e)
+            return
+        with self._spill_lock:
+            self._spill_size += len(data)
+            over = self._spill_size > self.spill_max_bytes
+        if over:
+            self._prune_spill_dir()
+
+    # Delete the oldest reports of the spill directory until it is back under 90% of
+    # its cap. The directory is listed again each time, since every worker of
+    # serve.py writes to it and the size kept here only counts this process's writes.
+    def _prune_spill_dir(self):
+        with self._spill_lock:
+            files = []
+            for entry in os.scandir(self.spill_dir):
+                if entry.name.endswith(".pdf"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, entry.path, stat.st_size))
+            total = sum(size for _, _, size in files)
+            target = self.spill_max_bytes * 0.9 if total > self.spill_max_bytes else total
+            for _, path, size in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Already removed by another worker
+                total -= size
+            self._spill_size = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,103 @@
+import weakref
+
+import numpy as np
+
+
+# Scores of many respondents at once; row i belongs to the i-th answer set
+class CohortScores:
+    def __init__(self, engine, totals, category_scores):
+        self.categories = engine.categories
+        self.totals = totals
+        self.category_scores = category_scores
+        self.max_score = engine.max_score
+        self.category_max_scores = engine.category_max_scores
+
+        # Same float operations as the per-request path, so values match bit for bit
+        self.percentages = (totals / engine.max_score) * 100 if engine.max_score > 0 else np.zeros(len(totals))
+        self.category_ratios = category_scores / engine.category_max_scores
+        self.weak = self.category_ratios < 0.5
+
+    def __len__(self):
+        return len(self.totals)
+
+    def weak_categories(self, row):
+        return [category for category, weak in zip(self.categories, self.weak[row]) if weak]
+
+    # Scores of one respondent in the shape returned by /api/submit
+    def row(self, row):
+        return {
+            "percentage_score": round(float(self.percentages[row]), 2),
+            "category_scores": dict(zip(self.categories, self.category_scores[row].tolist())),
+        }
+
+
+# Vectorized scoring over a compiled language: the question bank becomes an
+# option-score matrix and a question -> category index, and respondents become
+# an integer matrix of chosen option positions
+class ScoringEngine:
+    def __init__(self, questions):
+        self.categories = questions.categories
+        self.question_count = len(questions)
+        option_count = max(len(q["options"]) for q in questions.questions)
+
+        # Column `option_count` is the "no matching option" answer, worth 0
+        self.no_match = option_count
+        integral = all(isinstance(opt["score"], int) for q in questions.questions for opt in q["options"])
+        dtype = np.int64 if integral else np.float64
+        self.option_scores = np.zeros((self.question_count, option_count + 1), dtype=dtype)
+
+        # Answer text -> option position; the first option wins on duplicated texts
+        self.option_positions = []
+        for row, q in enumerate(questions.questions):
+            positions = {}
+            for column, option in enumerate(q["options"]):
+                self.option_scores[row, column] = option["score"]
+                positions.setdefault(option["text"], column)
+            self.option_positions.append(positions)
+
+        category_index = {category: i for i, category in enumerate(self.categories)}
+        self.question_categories = np.array([category_index[c] for c in questions.question_categories], dtype=np.intp)
+
+        # Question -> category one-hot matrix, so category totals are one matrix product
+        self.category_matrix = np.zeros((self.question_count, len(self.categories)), dtype=dtype)
+        self.category_matrix[np.arange(self.question_count), self.question_categories] = 1
+
+        self.category_max_scores = self.option_scores.max(axis=1) @ self.category_matrix
+        self.max_score = self.category_max_scores.sum()
+
+    # Turn answer sets (lists of option texts, in question order) into option positions
+    def encode(self, answer_sets):
+        matrix = np.full((len(answer_sets), self.question_count), self.no_match, dtype=np.intp)
+        for row, answers in enumerate(answer_sets):
+            for column, (positions, answer) in enumerate(zip(self.option_positions, answers)):
+                if isinstance(answer, str):
+                    matrix[row, column] = positions.get(answer, self.no_match)
+        return matrix
+
+    # Turn lists of chosen option positions (None for no match) into an answer matrix
+    def encode_options(self, option_sets):
+        matrix = np.full((len(option_sets), self.question_count), self.no_match, dtype=np.intp)
+        for row, options in enumerate(option_sets):
+            matrix[row] = [self.no_match if option is None else option for option in options]
+        return matrix
+
+    # Score an answer matrix from encode(); every row must cover all questions
+    def score_matrix(self, answer_matrix):
+        scores = self.option_scores[np.arange(self.question_count), answer_matrix]
+        return CohortScores(self, scores.sum(axis=1), scores @ self.category_matrix)
+
+    def score(self, answer_sets):
+        return self.score_matrix(self.encode(answer_sets))
+
+    def score_options(self, option_sets):
+        return self.score_matrix(self.encode_options(option_sets))
+
+
+_engines = weakref.WeakKeyDictionary()
+
+# Engine for a compiled language, built once and dropped along with the catalog
+def engine_for(questions):
+    engine = _engines.get(questions)
+    if engine is None:
+        engine = _engines.setdefault(questions, ScoringEngine(questions))
+    return engine
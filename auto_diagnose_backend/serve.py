@@ -0,0 +1,202 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger("serve")
+
+
+def parse_args():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Run the diagnostic API with several worker processes")
+    parser.add_argument("--host", default=os.environ.get("SERVE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SERVE_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVE_WORKERS", str(cpus))),
+                        help="worker processes forked after the catalog and report assets are loaded")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", "8")),
+                        help="connections each worker handles at once")
+    parser.add_argument("--keepalive", type=float, default=float(os.environ.get("SERVE_KEEPALIVE", "5")),
+                        help="seconds an idle keep-alive connection may hold a worker thread")
+    parser.add_argument("--drain-seconds", type=float, default=float(os.environ.get("SERVE_DRAIN_SECONDS", "0")),
+                        help="on shutdown, seconds to keep serving with /readyz failing before closing the listener")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.environ.get("SERVE_GRACEFUL_TIMEOUT", "30")),
+                        help="seconds workers get to finish requests in flight before being killed")
+    parser.add_argument("--access-log", action="store_true", help="log every request")
+    return parser.parse_args()
+
+
+def request_handler(keepalive):
+    class RequestHandler(WSGIRequestHandler):
+        timeout = keepalive
+    return RequestHandler
+
+
+# Threaded server with at most `threads` connections in progress; further
+# connections wait in the listen backlog. Request threads are not daemons, so
+# server_close() lets the requests in flight finish.
+class BoundedThreadedWSGIServer(ThreadedWSGIServer):
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, host, port, app, threads, handler=None):
+        super().__init__(host, port, app, handler)
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+# One worker: serve until SIGTERM/SIGINT, then fail readiness, stop accepting
+# after the drain period and wait for the requests in flight
+def run_worker(backend, server, drain_seconds):
+    stopping = threading.Event()
+
+    def shutdown_later():
+        time.sleep(drain_seconds)
+        server.shutdown()
+
+    def drain(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            backend.draining.set()
+            threading.Thread(target=shutdown_later, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    signal.signal(signal.SIGINT, drain)
+
+    backend.start_background_threads()
+    logger.info("Worker %s serving on http://%s:%s", os.getpid(), server.host, server.port)
+    server.serve_forever()
+    server.server_close()
+    backend.stop_background_threads()
+    backend.render_pool.shutdown(wait=True)
+    logger.info("Worker %s stopped", os.getpid())
+
+
+# Pre-fork supervisor: keeps `workers` children serving the shared listening
+# socket, replaces any that die, and on SIGTERM/SIGINT stops them gracefully
+class Supervisor:
+    def __init__(self, backend, server, workers, drain_seconds, graceful_timeout):
+        self.backend = backend
+        self.server = server
+        self.workers = workers
+        self.drain_seconds = drain_seconds
+        self.graceful_timeout = graceful_timeout
+        self.children = {}
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.backend, self.server, self.drain_seconds)
+            except BaseException:
+                logger.exception("Worker %s crashed", os.getpid())
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Stopping %d workers (signal %d)", len(self.children), signum)
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGTERM)
+        timer = threading.Timer(self.drain_seconds + self.graceful_timeout, self.kill_remaining)
+        timer.daemon = True
+        timer.start()
+
+    def kill_remaining(self):
+        for pid in list(self.children):
+            logger.warning("Worker %s did not stop in time, killing it", pid)
+            self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Serving on http://%s:%s with %d workers", self.server.host, self.server.port, self.workers)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.warning("Worker %s exited with code %s, starting a new one", pid, os.waitstatus_to_exitcode(status))
+            # Don't spin if workers die right after starting
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn()
+        self.server.server_close()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s [%(process)d] %(name)s %(message)s")
+    if not args.access_log:
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    # Split the CPUs between the PDF render pools of the workers unless told otherwise
+    workers = max(1, args.workers)
+    os.environ.setdefault("REPORT_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+    # Imported here so the settings above are in place when the app is configured
+    import backend
+    from scoring_engine import engine_for
+
+    # Load everything workers share before forking, so the pages stay shared
+    # copy-on-write, and move it out of the garbage collector's reach so
+    # collections in the workers don't write to those pages
+    backend.stop_background_threads()
+    backend.preload_report_assets()
+    for lang in backend.catalog.languages:
+        engine_for(backend.catalog.language(lang))
+    # Read the stored scores once here rather than in every worker
+    if backend.score_benchmark is not None:
+        backend.score_benchmark.sync()
+
+    server = BoundedThreadedWSGIServer(args.host, args.port, backend.app, args.threads, request_handler(args.keepalive))
+    gc.collect()
+    gc.freeze()
+
+    if workers == 1 or not hasattr(os, "fork"):
+        # Single process (always the case on Windows): the threaded server alone
+        run_worker(backend, server, args.drain_seconds)
+    else:
+        Supervisor(backend, server, workers, args.drain_seconds, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+# Obtém o diretório base do script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "data", "assessments.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    lang TEXT NOT NULL,
+    region TEXT,
+    questions_version TEXT,
+    answers TEXT NOT NULL,
+    total_score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    percentage_score REAL NOT NULL,
+    recommendations TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submission_categories (
+    submission_id TEXT NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    category_key TEXT,
+    score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    percentage REAL NOT NULL,
+    created_at REAL NOT NULL,
+    lang TEXT NOT NULL,
+    region TEXT,
+    PRIMARY KEY (submission_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_created ON submissions(created_at);
+CREATE INDEX IF NOT EXISTS idx_submissions_lang_created ON submissions(lang, created_at);
+CREATE INDEX IF NOT EXISTS idx_submissions_region_created ON submissions(region, created_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lang TEXT NOT NULL,
+    region TEXT,
+    questions_version TEXT NOT NULL,
+    answered INTEGER NOT NULL,
+    total_score REAL NOT NULL,
+    answered_max_score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_answers (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    option INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (session_id, position)
+);
+CREATE TABLE IF NOT EXISTS session_categories (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    score REAL NOT NULL,
+    answered_max_score REAL NOT NULL,
+    PRIMARY KEY (session_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+"""
+
+# Category aggregates group on the stable category key, so the same category
+# submitted in different languages is counted together. Created after the
+# column is added to databases made before it existed.
+CATEGORY_KEY_SCHEMA = """
+DROP INDEX IF EXISTS idx_categories_category_created;
+DROP INDEX IF EXISTS idx_categories_lang_category_created;
+DROP INDEX IF EXISTS idx_categories_region_category_created;
+CREATE INDEX IF NOT EXISTS idx_categories_key_created ON submission_categories(category_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_categories_lang_key_created ON submission_categories(lang, category_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_categories_region_key_created ON submission_categories(region, category_key, created_at);
+"""
+
+# Statements are constant strings, so sqlite3 compiles each one once per connection
+INSERT_SUBMISSION = """
+INSERT INTO submissions (id, created_at, lang, region, questions_version, answers, total_score, max_score, percentage_score, recommendations)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_CATEGORY = """
+INSERT INTO submission_categories (submission_id, position, category, category_key, score, max_score, percentage, created_at, lang, region)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_SUBMISSION = "SELECT * FROM submissions WHERE id = ?"
+SELECT_CATEGORIES = "SELECT category, score, max_score FROM submission_categories WHERE submission_id = ? ORDER BY position"
+SELECT_SCORES_SINCE = "SELECT rowid, percentage_score FROM submissions WHERE rowid > ? ORDER BY rowid"
+SELECT_CATEGORY_SCORES_SINCE = """
+SELECT rowid, category_key, percentage FROM submission_categories WHERE rowid > ? AND max_score > 0 ORDER BY rowid
+"""
+
+INSERT_SESSION = """
+INSERT INTO sessions (id, created_at, updated_at, lang, region, questions_version, answered, total_score, answered_max_score)
+VALUES (?, ?, ?, ?, ?, ?, 0, 0, 0)
+"""
+INSERT_SESSION_CATEGORY = """
+INSERT INTO session_categories (session_id, position, category, score, answered_max_score) VALUES (?, ?, ?, 0, 0)
+"""
+SELECT_SESSION = "SELECT * FROM sessions WHERE id = ?"
+SELECT_SESSION_CATEGORIES = """
+SELECT category, score, answered_max_score FROM session_categories WHERE session_id = ? ORDER BY position
+"""
+SELECT_SESSION_ANSWER = "SELECT option, score FROM session_answers WHERE session_id = ? AND position = ?"
+SELECT_SESSION_ANSWERS = "SELECT position, option FROM session_answers WHERE session_id = ? ORDER BY position"
+UPSERT_SESSION_ANSWER = "INSERT OR REPLACE INTO session_answers (session_id, position, option, score) VALUES (?, ?, ?, ?)"
+DELETE_SESSION_ANSWER = "DELETE FROM session_answers WHERE session_id = ? AND position = ?"
+UPDATE_SESSION_CATEGORY = """
+UPDATE session_categories SET score = score + ?, answered_max_score = answered_max_score + ?
+WHERE session_id = ? AND position = ?
+"""
+UPDATE_SESSION = """
+UPDATE sessions SET answered = answered + ?, total_score = total_score + ?, answered_max_score = answered_max_score + ?,
+updated_at = ? WHERE id = ?
+"""
+DELETE_EXPIRED_SESSIONS = "DELETE FROM sessions WHERE updated_at < ?"
+
+
+# Seconds since the epoch for an ISO date/datetime string (naive values are UTC)
+def parse_timestamp(value):
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+# Submission as stored by record(); `scores` is the /api/submit result
+def submission_row(submission_id, created_at, lang, region, version, answers, scores):
+    return (
+        submission_id, created_at, lang, region, version, json.dumps(answers, ensure_ascii=False),
+        sum(scores["category_scores"].values()), sum(scores["category_max_scores"].values()),
+        scores["percentage_score"], scores["recommendations"],
+    )
+
+
+# Category rows of a submission; `category_keys` maps its localized category names to their keys
+def category_rows(submission_id, created_at, lang, region, scores, category_keys):
+    max_scores = scores["category_max_scores"]
+    return [
+        (submission_id, position, category, category_keys.get(category, category), score, max_scores[category],
+         (score / max_scores[category]) * 100 if max_scores[category] > 0 else 0, created_at, lang, region)
+        for position, (category, score) in enumerate(scores["category_scores"].items())
+    ]
+
+
+# SQLite-backed record of every scored submission, with indexed aggregate queries.
+# Connections are pooled (one is opened per concurrent user, up to `pool_size`)
+# and the database runs in WAL mode so readers never block the writer.
+class AssessmentStore:
+    def __init__(self, path=DEFAULT_DB_PATH, pool_size=4):
+        self.path = path
+        self.pool_size = pool_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._reset_pool()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(submission_categories)")}
+            if "category_key" not in columns:
+                conn.execute("ALTER TABLE submission_categories ADD COLUMN category_key TEXT")
+            conn.executescript(CATEGORY_KEY_SCHEMA)
+        # Connections must not be shared with forked workers
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_pool)
+
+    def _reset_pool(self):
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=64)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # Borrow a pooled connection; the block runs in a transaction
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.pool_size
+                if can_open:
+                    self._opened += 1
+            conn = self._connect() if can_open else self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    # Fill in the category key of rows stored before the column existed, from a
+    # map of every localized category name to its key; unknown names are their own key
+    def backfill_category_keys(self, category_keys):
+        with self.connection() as conn:
+            if conn.execute("SELECT 1 FROM submission_categories WHERE category_key IS NULL LIMIT 1").fetchone() is None:
+                return 0
+            conn.executemany(
+                "UPDATE submission_categories SET category_key = ? WHERE category_key IS NULL AND category = ?",
+                [(key, name) for name, key in category_keys.items()],
+            )
+            return conn.execute("UPDATE submission_categories SET category_key = category WHERE category_key IS NULL").rowcount
+
+    # Store a scored submission and return its id
+    def record(self, lang, answers, scores, version=None, region=None, category_keys=None):
+        return self.record_many([(lang, answers, scores, version, region)], category_keys)[0]
+
+    # Store many scored submissions in one transaction; `category_keys` maps
+    # their localized category names to the stable keys aggregates group on
+    def record_many(self, submissions, category_keys=None):
+        category_keys = category_keys or {}
+        created_at = time.time()
+        ids = []
+        rows = []
+        categories = []
+        for lang, answers, scores, version, region in submissions:
+            submission_id = uuid.uuid4().hex
+            ids.append(submission_id)
+            rows.append(submission_row(submission_id, created_at, lang, region, version, answers, scores))
+            categories.extend(category_rows(submission_id, created_at, lang, region, scores, category_keys))
+        with self.connection() as conn:
+            conn.executemany(INSERT_SUBMISSION, rows)
+            conn.executemany(INSERT_CATEGORY, categories)
+        return ids
+
+    def get(self, submission_id):
+        with self.connection() as conn:
+            row = conn.execute(SELECT_SUBMISSION, (submission_id,)).fetchone()
+            if row is None:
+                return None
+            categories = conn.execute(SELECT_CATEGORIES, (submission_id,)).fetchall()
+        return {
+            "id": row["id"],
+            "created_at": format_timestamp(row["created_at"]),
+            "lang": row["lang"],
+            "region": row["region"],
+            "questions_version": row["questions_version"],
+            "answers": json.loads(row["answers"]),
+            "percentage_score": row["percentage_score"],
+            "category_scores": {c["category"]: _number(c["score"]) for c in categories},
+            "category_max_scores": {c["category"]: _number(c["max_score"]) for c in categories},
+            "recommendations": row["recommendations"],
+        }
+
+    # Overall and per-category percentages stored after the given rowids, as
+    # [(rowid, percentage)] and [(rowid, category key, percentage)] in insertion order
+    def scores_since(self, submission_rowid=0, category_rowid=0):
+        with self.connection() as conn:
+            scores = conn.execute(SELECT_SCORES_SINCE, (submission_rowid,)).fetchall()
+            category_scores = conn.execute(SELECT_CATEGORY_SCORES_SINCE, (category_rowid,)).fetchall()
+        return [tuple(row) for row in scores], [tuple(row) for row in category_scores]
+
+    # Start a scoring session with a zero total for each category of the questionnaire
+    def create_session(self, lang, version, categories, region=None):
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute(INSERT_SESSION, (session_id, now, now, lang, region, version))
+            conn.executemany(
+                INSERT_SESSION_CATEGORY, [(session_id, position, category) for position, category in enumerate(categories)]
+            )
+        return session_id
+
+    # Record (or with option=None, clear) the answer to one question and update the
+    # running totals by the difference with the previous answer; returns the new
+    # session state, or None for an unknown session
+    def answer_session(self, session_id, position, category_position, option, score, max_score):
+        with self.connection() as conn:
+            # Take the write lock up front so concurrent answers to a session are applied one at a time
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(SELECT_SESSION, (session_id,)).fetchone() is None:
+                return None
+            previous = conn.execute(SELECT_SESSION_ANSWER, (session_id, position)).fetchone()
+
+            if option is None:
+                conn.execute(DELETE_SESSION_ANSWER, (session_id, position))
+                answered, score_delta, max_delta = (-1, -previous["score"], -max_score) if previous else (0, 0, 0)
+            else:
+                conn.execute(UPSERT_SESSION_ANSWER, (session_id, position, option, score))
+                if previous:
+                    answered, score_delta, max_delta = 0, score - previous["score"], 0
+                else:
+                    answered, score_delta, max_delta = 1, score, max_score
+
+            if answered or score_delta:
+                conn.execute(UPDATE_SESSION_CATEGORY, (score_delta, max_delta, session_id, category_position))
+            conn.execute(UPDATE_SESSION, (answered, score_delta, max_delta, time.time(), session_id))
+            return self._session_state(conn, session_id)
+
+    def get_session(self, session_id, with_answers=False):
+        with self.connection() as conn:
+            state = self._session_state(conn, session_id)
+            if state is not None and with_answers:
+                state["answers"] = {row["position"]: row["option"] for row in conn.execute(SELECT_SESSION_ANSWERS, (session_id,))}
+        return state
+
+    @staticmethod
+    def _session_state(conn, session_id):
+        row = conn.execute(SELECT_SESSION, (session_id,)).fetchone()
+        if row is None:
+            return None
+        categories = conn.execute(SELECT_SESSION_CATEGORIES, (session_id,)).fetchall()
+        return {
+            "id": row["id"],
+            "lang": row["lang"],
+            "region": row["region"],
+            "questions_version": row["questions_version"],
+            "answered": row["answered"],
+            "total_score": _number(row["total_score"]),
+            "answered_max_score": _number(row["answered_max_score"]),
+            "categories": [(c["category"], _number(c["score"]), _number(c["answered_max_score"])) for c in categories],
+        }
+
+    # Drop sessions nobody has answered in since `before` (seconds since the epoch)
+    def expire_sessions(self, before):
+        with self.connection() as conn:
+            return conn.execute(DELETE_EXPIRED_SESSIONS, (before,)).rowcount
+
+    @staticmethod
+    def _filters(lang=None, region=None, since=None, until=None, category=None):
+        clauses, params = [], []
+        for column, value in (("lang", lang), ("region", region), ("category_key", category)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    # Average score per category key, e.g. "average Network Security score this
+    # quarter" over the submissions of every language
+    def category_averages(self, lang=None, region=None, since=None, until=None, category=None):
+        where, params = self._filters(lang, region, since, until, category)
+        sql = (
+            "SELECT category_key, COUNT(*) AS submissions, AVG(score) AS average_score, "
+            "AVG(max_score) AS average_max_score, AVG(percentage) AS average_percentage "
+            f"FROM submission_categories{where} GROUP BY category_key ORDER BY category_key"
+        )
+        with self.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {
+                "key": row["category_key"],
+                "submissions": row["submissions"],
+                "average_score": round(row["average_score"], 2),
+                "average_max_score": round(row["average_max_score"], 2),
+                "average_percentage": round(row["average_percentage"], 2),
+            }
+            for row in rows
+        ]
+
+    # Submission count and overall percentage statistics
+    def overall_stats(self, lang=None, region=None, since=None, until=None):
+        where, params = self._filters(lang, region, since, until)
+        sql = (
+            "SELECT COUNT(*) AS submissions, AVG(percentage_score) AS average, "
+            f"MIN(percentage_score) AS minimum, MAX(percentage_score) AS maximum FROM submissions{where}"
+        )
+        with self.connection() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return {
+            "submissions": row["submissions"],
+            "average_percentage_score": round(row["average"], 2) if row["average"] is not None else None,
+            "min_percentage_score": row["minimum"],
+            "max_percentage_score": row["maximum"],
+        }
+
+
+# Scores are stored as REAL; give integral values back as ints, as /api/submit does
+def _number(value):
+    return int(value) if float(value).is_integer() else value
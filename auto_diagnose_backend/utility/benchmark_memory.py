@@ -0,0 +1,125 @@
+import gc
+import io
+import os
+import subprocess
+import sys
+import tracemalloc
+
+# Allow running as `python utility/benchmark_memory.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QUESTIONS_RELOAD_INTERVAL", "0")
+os.environ.setdefault("ASSESSMENT_DB", "")
+
+from flask import send_file
+
+import backend
+from report import get_report_assets, layout_report, prepare_report, render_report
+
+REQUESTS = int(os.environ.get("BENCH_REQUESTS", "10"))
+DOWNLOAD_NAME = "cybersecurity_diagnostic_report.pdf"
+
+
+# Prepared report with every question answered with its lowest-scoring option
+def sample_report(lang):
+    questions = backend.catalog.language(lang)
+    answers = [min(q["options"], key=lambda option: option["score"])["text"] for q in questions.questions]
+    _, category_scores = questions.score(answers)
+    return prepare_report(questions, lang, answers, category_scores, questions.category_max_scores)
+
+
+# Before: str output, a second latin-1 copy, a third copy in a BytesIO, then send_file
+def legacy_request(report):
+    pdf = layout_report(report)
+    pdf_output = io.BytesIO()
+    pdf_bytes = pdf.output(dest="S").encode("latin1", "ignore")
+    pdf_output.write(pdf_bytes)
+    pdf_output.seek(0)
+    return send_file(pdf_output, mimetype="application/pdf", as_attachment=True, download_name=DOWNLOAD_NAME)
+
+
+# After: bytes produced once and streamed in slices
+def streaming_request(report):
+    return backend.pdf_response(render_report(report), DOWNLOAD_NAME)
+
+
+# Drive the response like a WSGI server would, writing each chunk out and dropping it
+def consume(response):
+    sent = 0
+    for chunk in response.response:
+        sent += len(chunk)
+    response.close()
+    return sent
+
+
+def read_status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return None
+
+
+# Peak resident memory above the starting point while handling one request (Linux only)
+def peak_rss_kb(handler, report):
+    gc.collect()
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")  # Resets VmHWM to the current RSS
+    start = read_status("VmRSS")
+    with backend.app.test_request_context():
+        consume(handler(report))
+    return read_status("VmHWM") - start
+
+
+# Peak Python allocations while handling one request
+def peak_traced_kb(handler, report):
+    gc.collect()
+    tracemalloc.start()
+    with backend.app.test_request_context():
+        consume(handler(report))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def summarize(samples):
+    return f"max {max(samples):8.0f} KB | avg {sum(samples) / len(samples):8.0f} KB"
+
+
+HANDLERS = {"before": legacy_request, "after": streaming_request}
+
+
+# Child process: load the assets, then report the RSS peak of a single first request,
+# so the allocator has no freed memory from earlier requests to hide it in
+def child(mode, lang):
+    get_report_assets().new_document(lang)
+    print(peak_rss_kb(HANDLERS[mode], sample_report(lang)))
+
+
+def fresh_process_rss_kb(mode, lang):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, lang],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return int(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    get_report_assets()
+    rss_supported = os.path.exists("/proc/self/clear_refs")
+
+    for lang in backend.catalog.languages:
+        report = sample_report(lang)
+        for mode, label in (("before", "before (buffered x3)"), ("after", "after (streamed)")):
+            handler = HANDLERS[mode]
+            with backend.app.test_request_context():
+                size = consume(handler(report))  # Warm-up, also lays out the cover
+
+            traced = [peak_traced_kb(handler, report) for _ in range(REQUESTS)]
+            print(f"[{lang}] {label:22s} {size:7d} bytes | python heap peak {summarize(traced)}")
+            if rss_supported:
+                rss = [fresh_process_rss_kb(mode, lang) for _ in range(3)]
+                print(f"[{lang}] {label:22s} {'':13s} | peak RSS growth  {summarize(rss)} (first request, fresh process)")
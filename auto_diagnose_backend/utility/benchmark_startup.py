@@ -0,0 +1,106 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Allow running as `python utility/benchmark_startup.py` from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+RUNS = int(os.environ.get("BENCH_RUNS", "5"))
+MODES = ("json", "compiled")
+
+
+def read_kb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# Memory a forked worker does not share with its parent (Linux only)
+def private_kb():
+    clean = read_kb("/proc/self/smaps_rollup", "Private_Clean")
+    dirty = read_kb("/proc/self/smaps_rollup", "Private_Dirty")
+    return None if clean is None or dirty is None else clean + dirty
+
+
+# Child process: time the catalog load and the whole backend import, then fork a
+# worker that serves a few requests and report how much memory it made private
+def child(mode):
+    os.environ["QUESTIONS_COMPILED"] = "" if mode == "json" else os.environ.get("QUESTIONS_COMPILED_BENCH", "")
+    os.environ["QUESTIONS_RELOAD_INTERVAL"] = "0"
+    os.environ["ASSESSMENT_DB"] = ""
+
+    import catalog
+    loads = []
+    for _ in range(20):
+        load_start = time.perf_counter()
+        catalog.load_catalog()
+        loads.append(time.perf_counter() - load_start)
+
+    import_start = time.perf_counter()
+    import backend
+    result = {
+        "load_catalog_ms": statistics.median(loads) * 1000,
+        "import_backend_ms": (time.perf_counter() - import_start) * 1000,
+        "rss_after_import_kb": read_kb("/proc/self/status", "VmRSS"),
+    }
+    backend.preload_report_assets()
+    # What a server pays before it can answer: import, catalog, fonts and covers
+    result["startup_ms"] = (time.perf_counter() - import_start) * 1000
+
+    if hasattr(os, "fork"):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            client = backend.app.test_client()
+            questions = backend.catalog.language("en")
+            answers = [q["options"][0]["text"] for q in questions.questions]
+            for lang in backend.catalog.languages:
+                client.get(f"/api/questions?lang={lang}")
+                client.post(f"/api/submit?lang={lang}", json={"answers": answers})
+            os.write(write_end, json.dumps({"worker_private_kb": private_kb()}).encode())
+            os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as f:
+            result.update(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    print(json.dumps(result))
+
+
+def run_child(mode, compiled_path):
+    env = dict(os.environ, QUESTIONS_COMPILED_BENCH=compiled_path)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode],
+        capture_output=True, text=True, check=True, env=env, cwd=BACKEND_DIR,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+        sys.exit(0)
+
+    from catalog import COMPILED_QUESTIONS_PATH, compile_question_bank
+
+    # Always measure against a build of the current JSON
+    compiled_path = COMPILED_QUESTIONS_PATH or os.path.join(BACKEND_DIR, "questions", "questions.bin")
+    compile_question_bank(compiled_path=compiled_path)
+
+    for mode in MODES:
+        runs = [run_child(mode, compiled_path) for _ in range(RUNS)]
+        summary = {key: statistics.median(run[key] for run in runs) for key in runs[0] if runs[0][key] is not None}
+        print(
+            f"[{mode:8s}] load_catalog {summary['load_catalog_ms']:6.2f} ms | import backend {summary['import_backend_ms']:7.1f} ms"
+            f" | startup {summary['startup_ms']:7.1f} ms | RSS after import {summary['rss_after_import_kb']:7.0f} KB"
+            + (f" | worker private {summary['worker_private_kb']:6.0f} KB" if "worker_private_kb" in summary else "")
+        )
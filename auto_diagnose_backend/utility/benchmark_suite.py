@@ -0,0 +1,384 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Allow running as `python utility/benchmark_suite.py` from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("QUESTIONS_RELOAD_INTERVAL", "0")
+# Submissions made by the load test go to a throwaway database
+os.environ.setdefault("ASSESSMENT_DB", os.path.join(tempfile.mkdtemp(prefix="auto_diagnose_bench_"), "assessments.db"))
+
+from werkzeug.serving import make_server
+
+import backend
+from report import ReportAssets, get_report_assets, prepare_report, render_report
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmark_results")
+LANGUAGES = tuple(backend.catalog.languages)
+
+# Lower is better for every metric except these
+HIGHER_IS_BETTER = {"throughput_rps", "ops_per_second"}
+
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+# Answer set picking a random option for every question
+def random_answers(questions, rng):
+    return [rng.choice(q["options"])["text"] for q in questions.questions]
+
+
+def read_status(field, pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# Reset the peak RSS counter of a process (Linux only); returns False if unsupported
+def reset_peak_rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# PIDs of the report rendering workers forked so far
+def render_worker_pids():
+    executor = backend.render_pool._executor
+    return list(getattr(executor, "_processes", None) or {}) if executor is not None else []
+
+
+# Peak memory while running `fn`, for this process and for the render workers
+def with_peak_memory(fn):
+    pids = ["self"] + render_worker_pids()
+    tracked = [pid for pid in pids if reset_peak_rss(pid)]
+    result = fn()
+    memory = {}
+    if "self" in tracked:
+        memory["peak_rss_kb"] = read_status("VmHWM")
+    else:
+        # ru_maxrss is the peak since start-up, not for this run alone (KB on Linux, bytes on macOS)
+        memory["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = [read_status("VmHWM", pid) for pid in tracked if pid != "self"]
+    workers = [kb for kb in workers if kb is not None]
+    if workers:
+        memory["render_worker_peak_rss_kb"] = max(workers)
+    return result, memory
+
+
+# ---------------------------------------------------------------------------
+# Micro-benchmarks: the functions behind the endpoints, without HTTP or Flask
+# ---------------------------------------------------------------------------
+
+def time_calls(fn, iterations, warm_up=True):
+    if warm_up:
+        fn()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    result = latency_summary(timings)
+    result["ops_per_second"] = round(len(timings) / sum(timings), 1)
+    return result
+
+
+# Before shared assets: fonts and images parsed for every document, as each
+# request used to do, without the decoded image cache that did not exist then
+def render_report_cold(report):
+    return render_report(report, ReportAssets(png_cache=False))
+
+
+def run_micro(iterations, pdf_iterations, cold_pdf_iterations, rng):
+    results = {}
+    for lang in LANGUAGES:
+        questions = backend.catalog.language(lang)
+        answer_sets = [random_answers(questions, rng) for _ in range(64)]
+        answers = iter(answer_sets * (iterations // len(answer_sets) + 2))
+        keyed_sets = [questions.keyed_answers(questions.translate(answer_set)) for answer_set in answer_sets]
+        keyed = iter(keyed_sets * (iterations // len(keyed_sets) + 2))
+
+        _, category_scores = questions.score(answer_sets[0])
+        report = prepare_report(questions, lang, answer_sets[0], category_scores, questions.category_max_scores)
+
+        results[f"get_questions_by_language[{lang}]"] = time_calls(lambda: backend.get_questions_by_language(lang), iterations)
+        results[f"score_answers[{lang}]"] = time_calls(lambda: backend.score_answers(questions, next(answers), lang), iterations)
+        results[f"score_answers_keyed[{lang}]"] = time_calls(lambda: backend.score_answers(questions, next(keyed), lang), iterations)
+        results[f"prepare_report[{lang}]"] = time_calls(
+            lambda: prepare_report(questions, lang, answer_sets[0], category_scores, questions.category_max_scores), iterations
+        )
+        results[f"render_report[{lang}]"] = time_calls(lambda: render_report(report), pdf_iterations)
+        if cold_pdf_iterations:
+            # Every call is cold, so there is nothing to warm up
+            results[f"render_report_cold_assets[{lang}]"] = time_calls(
+                lambda: render_report_cold(report), cold_pdf_iterations, warm_up=False
+            )
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Load generator: many clients at once against the Flask app
+# ---------------------------------------------------------------------------
+
+# Flask test client: the full WSGI stack in-process, without sockets
+class TestClientTransport:
+    name = "test_client"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def request(self, method, path, body=None):
+        with backend.app.test_client() as client:
+            response = client.open(path, method=method, json=body)
+            size = len(response.get_data())
+            return response.status_code, size
+
+
+# Real HTTP against a threaded Werkzeug server on a free local port
+class WSGIServerTransport:
+    name = "wsgi_server"
+
+    def __enter__(self):
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No access log line per request
+        self.server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        return False
+
+    def request(self, method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+        try:
+            headers = {"Accept-Encoding": "gzip"}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body).encode("utf-8")
+                headers["Content-Type"] = "application/json"
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            return response.status, len(response.read())
+        finally:
+            conn.close()
+
+
+# Request factories: each call returns (method, path, body) for one request
+def questions_request(lang, rng):
+    return "GET", f"/api/questions?lang={lang}", None
+
+
+def submit_request(lang, rng):
+    return "POST", f"/api/submit?lang={lang}", {"answers": random_answers(backend.catalog.language(lang), rng)}
+
+
+# Random answers, so almost every report misses the cache and is really rendered
+def pdf_request(lang, rng):
+    questions = backend.catalog.language(lang)
+    answers = random_answers(questions, rng)
+    result, _, _ = backend.score_answers(questions, answers, lang)
+    return "POST", f"/api/generate-pdf?lang={lang}", {"answers": answers, **result}
+
+
+ENDPOINTS = {
+    "/api/questions": questions_request,
+    "/api/submit": submit_request,
+    "/api/generate-pdf": pdf_request,
+}
+
+
+def drive(transport, factory, total, concurrency, rng):
+    requests = [factory(LANGUAGES[i % len(LANGUAGES)], rng) for i in range(total)]
+    latencies = [None] * total
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(index):
+        method, path, body = requests[index]
+        start = time.perf_counter()
+        try:
+            status, _ = transport.request(method, path, body)
+        except Exception as e:
+            status = type(e).__name__
+        latencies[index] = time.perf_counter() - start
+        with lock:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(total)))
+    elapsed = time.perf_counter() - start
+
+    result = latency_summary(latencies)
+    result["throughput_rps"] = round(total / elapsed, 1)
+    result["elapsed_s"] = round(elapsed, 3)
+    result["statuses"] = statuses
+    result["errors"] = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return result
+
+
+def run_load(transport_cls, totals, concurrency, rng):
+    results = {}
+    with transport_cls() as transport:
+        for endpoint, factory in ENDPOINTS.items():
+            total = totals[endpoint]
+            drive(transport, factory, min(total, concurrency * 2), concurrency, rng)  # Warm-up (forks render workers)
+            result, memory = with_peak_memory(lambda: drive(transport, factory, total, concurrency, rng))
+            result.update(memory)
+            results[endpoint] = result
+            print(
+                f"  {endpoint:18s} {total:5d} req | p50 {result['p50_ms']:8.2f} ms | p95 {result['p95_ms']:8.2f} ms | "
+                f"p99 {result['p99_ms']:8.2f} ms | {result['throughput_rps']:8.1f} req/s | errors {result['errors']}"
+            )
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Results file and comparison with an earlier run
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+# Flatten {"section": {"name": {"metric": value}}} into comparable numeric metrics
+def numeric_metrics(results):
+    metrics = {}
+    for section in ("micro", "load"):
+        for name, values in results.get(section, {}).items():
+            for metric, value in values.items():
+                if isinstance(value, (int, float)) and metric not in ("count", "errors", "elapsed_s"):
+                    metrics[(section, name, metric)] = value
+    return metrics
+
+
+# Print every metric next to the baseline run; returns the metrics that got worse by more than `threshold`
+def compare(baseline, current, threshold):
+    old, new = numeric_metrics(baseline), numeric_metrics(current)
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = -change if key[2] in HIGHER_IS_BETTER else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(key)
+        print(f"  {key[0]:5s} {key[1]:38s} {key[2]:26s} {before:12.2f} -> {after:12.2f} ({change:+7.1%}){flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks and load test for the diagnostic API")
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous clients in the load test")
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint (questions and submit)")
+    parser.add_argument("--pdf-requests", type=int, default=60, help="requests to /api/generate-pdf")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per micro-benchmark")
+    parser.add_argument("--pdf-iterations", type=int, default=20, help="calls per PDF rendering micro-benchmark")
+    parser.add_argument("--cold-pdf-iterations", type=int, default=3,
+                        help="calls rendering with fonts and images parsed per document, as before shared assets (0 skips it)")
+    parser.add_argument("--transport", choices=("test_client", "wsgi_server"), default="test_client",
+                        help="drive the app through the Flask test client or a local threaded HTTP server")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="results file (default: benchmark_results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rng = random.Random(args.seed)
+    get_report_assets()
+    backend.preload_report_assets()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "questions_version": backend.catalog.version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "micro": {},
+        "load": {},
+    }
+    results["config"]["report_workers"] = backend.REPORT_WORKERS
+
+    if not args.skip_micro:
+        print("Micro-benchmarks")
+        results["micro"] = run_micro(args.iterations, args.pdf_iterations, args.cold_pdf_iterations, rng)
+        for name, result in results["micro"].items():
+            print(f"  {name:38s} p50 {result['p50_ms']:8.3f} ms | p99 {result['p99_ms']:8.3f} ms | {result['ops_per_second']:10.1f} ops/s")
+        for lang in LANGUAGES:
+            cold = results["micro"].get(f"render_report_cold_assets[{lang}]")
+            if cold:
+                shared = results["micro"][f"render_report[{lang}]"]
+                print(f"  shared report assets [{lang}]: x{cold['mean_ms'] / shared['mean_ms']:.1f} faster than per-document")
+
+    if not args.skip_load:
+        transport = TestClientTransport if args.transport == "test_client" else WSGIServerTransport
+        print(f"Load test ({args.transport}, concurrency {args.concurrency})")
+        totals = {"/api/questions": args.requests, "/api/submit": args.requests, "/api/generate-pdf": args.pdf_requests}
+        results["load"] = run_load(transport, totals, args.concurrency, rng)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'local'}.json")
+    write_results(results, output)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
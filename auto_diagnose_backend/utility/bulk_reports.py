@@ -0,0 +1,64 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+import urllib.request
+
+# Allow running as `python utility/bulk_reports.py` from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render the reports of many answer sets or submissions into one ZIP archive")
+    parser.add_argument("input", help="JSON array or NDJSON file (.ndjson/.jsonl) of /api/generate-pdf bodies, each with an optional id")
+    parser.add_argument("output", help="ZIP archive to write")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--url", help="server to send the reports to, e.g. http://127.0.0.1:5000; "
+                                      "without it they are rendered in this process's render pool")
+    return parser.parse_args()
+
+
+def content_type(path):
+    return "application/x-ndjson" if path.endswith((".ndjson", ".jsonl")) else "application/json"
+
+
+# Through a running server; the archive is written as it arrives
+def from_server(args):
+    with open(args.input, "rb") as f:
+        body = f.read()
+    request = urllib.request.Request(
+        f"{args.url.rstrip('/')}/api/generate-pdf/bulk?lang={args.lang}", data=body,
+        headers={"Content-Type": content_type(args.input)},
+    )
+    with urllib.request.urlopen(request) as response, open(args.output, "wb") as out:
+        shutil.copyfileobj(response, out)
+
+
+# In this process: the same endpoint through the Flask test client, streamed to the file
+def in_process(args):
+    import backend
+    backend.preload_report_assets()
+    with open(args.input, "rb") as f:
+        body = f.read()
+    response = backend.app.test_client().post(
+        f"/api/generate-pdf/bulk?lang={args.lang}", data=body, content_type=content_type(args.input), buffered=False
+    )
+    if response.status_code != 200:
+        sys.exit(f"❌ {response.get_data(as_text=True)}")
+    with open(args.output, "wb") as out:
+        for chunk in response.response:
+            out.write(chunk)
+    response.close()
+    backend.render_pool.shutdown()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    if args.url:
+        from_server(args)
+    else:
+        in_process(args)
+    print(f"✅ {args.output} written in {time.perf_counter() - start:.1f} s ({os.path.getsize(args.output) / 1e6:.1f} MB)")
@@ -0,0 +1,28 @@
+import os
+import sys
+import time
+
+# Allow running as `python utility/compile_questions.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import COMPILED_QUESTIONS_PATH, QUESTIONS_PATH, compile_question_bank, load_catalog
+
+# Build questions/questions.bin from questions/questions.json. Run it after every
+# edit of the JSON; until then the server keeps compiling the JSON at startup.
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else QUESTIONS_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else COMPILED_QUESTIONS_PATH
+
+    start = time.perf_counter()
+    size = compile_question_bank(source, target)
+    print(f"✅ Compiled {source} -> {target} ({size} bytes, {1000 * (time.perf_counter() - start):.1f} ms)")
+
+    # Loading it back must give exactly what the JSON gives
+    from_json = load_catalog(source, compiled_path=None)
+    from_binary = load_catalog(source, compiled_path=target)
+    for lang, expected in from_json.languages.items():
+        loaded = from_binary.language(lang)
+        if loaded.questions != expected.questions or loaded.questions_payload.variants != expected.questions_payload.variants:
+            print(f"🚨 Compiled question bank differs from the JSON for '{lang}'")
+            sys.exit(1)
+    print(f"✅ Verified against the JSON (version {from_binary.version})")
@@ -0,0 +1,371 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+# Allow running as `python utility/stress_concurrency.py` from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("QUESTIONS_RELOAD_INTERVAL", "0")
+# Submissions and sessions made by the stress test go to a throwaway database
+os.environ.setdefault("ASSESSMENT_DB", os.path.join(tempfile.mkdtemp(prefix="auto_diagnose_stress_"), "assessments.db"))
+
+from werkzeug.serving import make_server
+
+import backend
+from catalog import load_catalog
+
+LANGUAGES = tuple(backend.catalog.languages)
+
+# Fields that differ between runs whatever the concurrency: ids and dates of the
+# rows and report jobs created, and benchmark ranks, which depend on the
+# submissions stored before
+VOLATILE_FIELDS = {
+    "id", "submission_id", "session_id", "created_at", "job_id", "status_url",
+    "population", "percentile", "category_percentiles",
+}
+
+
+# ---------------------------------------------------------------------------
+# Transports: request(method, path, body) -> (status, content type, body bytes)
+# ---------------------------------------------------------------------------
+
+# Flask test client, one per thread: the full WSGI stack in-process, without sockets
+class TestClientTransport:
+    name = "test_client"
+
+    def __enter__(self):
+        self.local = threading.local()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def request(self, method, path, body=None):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = backend.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.mimetype, response.get_data()
+
+
+# Real HTTP against a threaded Werkzeug server on a free local port
+class WSGIServerTransport:
+    name = "wsgi_server"
+
+    def __enter__(self):
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No access log line per request
+        self.server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        return False
+
+    def request(self, method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=120)
+        try:
+            headers = {"Accept-Encoding": "gzip"}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body).encode("utf-8")
+                headers["Content-Type"] = "application/json"
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            if response.getheader("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            mimetype = (response.getheader("Content-Type") or "").split(";")[0]
+            return response.status, mimetype, data
+        finally:
+            conn.close()
+
+
+TRANSPORTS = {"test_client": TestClientTransport, "wsgi_server": WSGIServerTransport}
+
+
+# ---------------------------------------------------------------------------
+# Scenarios: each sends a few related requests and returns one comparable
+# outcome per request. They only depend on their own seeded random generator,
+# so the same item gives the same outcomes in any thread and in any order.
+# ---------------------------------------------------------------------------
+
+# fpdf stamps every document with the time it was rendered
+def pdf_digest(data):
+    return hashlib.sha256(re.sub(rb"/CreationDate \(D:\d+\)", b"", data)).hexdigest()
+
+
+def strip_volatile(value):
+    if isinstance(value, dict):
+        return {key: strip_volatile(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [strip_volatile(item) for item in value]
+    return value
+
+
+# What a response must look like in every run: its status and its body, with the
+# volatile JSON fields removed and documents reduced to a digest
+def outcome(label, response):
+    status, mimetype, data = response
+    if mimetype == "application/json":
+        body = strip_volatile(json.loads(data))
+    elif mimetype == "application/x-ndjson":
+        body = [strip_volatile(json.loads(line)) for line in data.splitlines() if line]
+    elif mimetype == "application/zip":
+        # Reports are added as they finish rendering, so compare the entries, not their order
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            body = {name: pdf_digest(archive.read(name)) for name in sorted(archive.namelist())}
+    else:
+        body = pdf_digest(data)
+    return label, status, body
+
+
+def random_options(questions, rng):
+    return [rng.randrange(len(q["options"])) for q in questions.questions]
+
+
+def text_answers(questions, options):
+    return [q["options"][option]["text"] for q, option in zip(questions.questions, options)]
+
+
+def keyed_answers(questions, options):
+    return {str(q["id"]): option for q, option in zip(questions.questions, options)}
+
+
+def questions_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    key = questions.category_keys[rng.choice(questions.categories)]
+    return [
+        outcome("questions", transport.request("GET", f"/api/questions?lang={lang}")),
+        outcome("questions_compact", transport.request("GET", f"/api/questions?lang={lang}&fields=compact")),
+        outcome("question_categories", transport.request("GET", f"/api/questions/categories?lang={lang}")),
+        outcome("questions_section", transport.request(
+            "GET", f"/api/questions?lang={lang}&fields=compact&category={key.replace(' ', '%20')}")),
+    ]
+
+
+# Legacy text answers, then the stored submission read back
+def submit_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    response = transport.request("POST", f"/api/submit?lang={lang}", {"answers": text_answers(questions, random_options(questions, rng))})
+    outcomes = [outcome("submit", response)]
+    submission_id = json.loads(response[2]).get("submission_id")
+    if submission_id:
+        outcomes.append(outcome("submission", transport.request("GET", f"/api/submissions/{submission_id}")))
+    return outcomes
+
+
+def submit_keyed_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    body = {"answers": keyed_answers(questions, random_options(questions, rng))}
+    return [
+        outcome("submit_keyed", transport.request("POST", f"/api/submit?lang={lang}&benchmark=1", body)),
+        outcome("benchmark", transport.request("POST", f"/api/benchmark?lang={lang}", body)),
+    ]
+
+
+def batch_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    items = []
+    for index in range(rng.randint(5, 40)):
+        options = random_options(questions, rng)
+        answers = keyed_answers(questions, options) if rng.random() < 0.5 else text_answers(questions, options)
+        items.append({"id": f"r{index}", "answers": answers})
+    items.append({"id": "broken", "answers": ["Yes"]})
+    store = rng.choice(("0", "1"))
+    return [outcome("submit_batch", transport.request("POST", f"/api/submit/batch?lang={lang}&store={store}", items))]
+
+
+# A scoring session answered one question at a time, partly by option text
+def session_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    response = transport.request("POST", f"/api/sessions?lang={lang}", {"region": "stress"})
+    outcomes = [outcome("session_create", response)]
+    session_id = json.loads(response[2]).get("session_id")
+    if not session_id:
+        return outcomes
+    for q, option in zip(questions.questions, random_options(questions, rng)):
+        if rng.random() < 0.3:
+            body = {"question_id": q["id"], "answer": q["options"][option]["text"]}
+        else:
+            body = {"question_id": q["id"], "option": option}
+        outcomes.append(outcome("session_answer", transport.request("PATCH", f"/api/sessions/{session_id}", body)))
+    outcomes.append(outcome("session", transport.request("GET", f"/api/sessions/{session_id}")))
+    outcomes.append(outcome("session_submit", transport.request("POST", f"/api/sessions/{session_id}/submit")))
+    return outcomes
+
+
+# Few distinct answer sets, so both rendered and cached reports are served
+def pdf_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    seeded = random.Random(rng.randrange(8))
+    body = {"answers": keyed_answers(questions, random_options(questions, seeded))}
+    if rng.random() < 0.5:
+        return [outcome("generate_pdf", transport.request("POST", f"/api/generate-pdf?lang={lang}", body))]
+
+    response = transport.request("POST", f"/api/generate-pdf?lang={lang}&async=1", body)
+    outcomes = [outcome("generate_pdf_async", response)]
+    status_url = json.loads(response[2]).get("status_url")
+    while status_url:
+        response = transport.request("GET", status_url)
+        if response[0] != 202:
+            outcomes.append(outcome("report_job", response))
+            break
+        time.sleep(0.02)
+    return outcomes
+
+
+def bulk_scenario(transport, lang, rng):
+    questions = backend.catalog.language(lang)
+    items = [{"id": f"r{index}", "answers": keyed_answers(questions, random_options(questions, rng))} for index in range(3)]
+    items.append({"id": "broken", "answers": {"0": 0}})
+    return [outcome("generate_pdf_bulk", transport.request("POST", f"/api/generate-pdf/bulk?lang={lang}", items))]
+
+
+# Endpoints whose bodies depend on what ran before; only their status is compared
+def status_scenario(transport, lang, rng):
+    return [
+        (path, transport.request("GET", path)[0], None)
+        for path in (f"/api/stats?lang={lang}", "/api/reports/cache", "/metrics", "/healthz", "/readyz")
+    ]
+
+
+# Scenario -> weight in the workload
+SCENARIOS = {
+    "questions": (questions_scenario, 6),
+    "submit": (submit_scenario, 6),
+    "submit_keyed": (submit_keyed_scenario, 4),
+    "batch": (batch_scenario, 2),
+    "session": (session_scenario, 1),
+    "pdf": (pdf_scenario, 1),
+    "bulk": (bulk_scenario, 0.3),
+    "status": (status_scenario, 2),
+}
+
+
+# The same workload for every run: (scenario, language, seed) per item
+def build_workload(items, seed):
+    rng = random.Random(seed)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][1] for name in names]
+    return [(rng.choices(names, weights)[0], rng.choice(LANGUAGES), rng.randrange(2 ** 32)) for _ in range(items)]
+
+
+def run_item(transport, item):
+    name, lang, seed = item
+    try:
+        return SCENARIOS[name][0](transport, lang, random.Random(seed))
+    except Exception as e:
+        return [(name, type(e).__name__, str(e))]
+
+
+# Reload the catalog from questions.json over and over while the run goes on;
+# requests keep the snapshot they started with, so results must not change
+def keep_reloading(stop, interval):
+    reloads = 0
+    while not stop.wait(interval):
+        backend.swap_catalog(load_catalog(compiled_path=""))
+        reloads += 1
+    return reloads
+
+
+def run(transport, workload, threads, reload_interval):
+    stop = threading.Event()
+    reloads = []
+    reloader = None
+    if reload_interval > 0:
+        reloader = threading.Thread(target=lambda: reloads.append(keep_reloading(stop, reload_interval)), daemon=True)
+        reloader.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda item: run_item(transport, item), workload))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    if reloader is not None:
+        reloader.join()
+    return results, elapsed, reloads[0] if reloads else 0
+
+
+# Items whose outcomes differ from the reference run
+def mismatches(reference, results, workload):
+    return [
+        (item, expected, got)
+        for item, expected, got in zip(workload, reference, results)
+        if expected != got
+    ]
+
+
+def describe(expected, got):
+    for want, have in zip(expected, got):
+        if want != have:
+            return f"expected {json.dumps(want, ensure_ascii=False)[:300]}\n      got {json.dumps(have, ensure_ascii=False)[:300]}"
+    return f"expected {len(expected)} responses, got {len(got)}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Hit every endpoint from many threads and check the results match a single-threaded run"
+    )
+    parser.add_argument("--threads", default="1,2,4,8,16", help="comma-separated thread counts to run")
+    parser.add_argument("--items", type=int, default=400, help="scenarios in the workload")
+    parser.add_argument("--transport", choices=sorted(TRANSPORTS), default="test_client",
+                        help="drive the app through the Flask test client or a local threaded HTTP server")
+    parser.add_argument("--reload-interval", type=float, default=0.05,
+                        help="seconds between catalog reloads during the measured runs (0 disables them)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    thread_counts = [int(count) for count in args.threads.split(",")]
+    workload = build_workload(args.items, args.seed)
+    backend.preload_report_assets()
+
+    failed = False
+    with TRANSPORTS[args.transport]() as transport, contextlib.redirect_stdout(io.StringIO()):
+        # The reference: one thread, no reloads. It also warms up the render
+        # workers and the report cache, which the other runs then share.
+        reference, _, _ = run(transport, workload, 1, 0)
+        requests = sum(len(outcomes) for outcomes in reference)
+        errors = [outcome for outcomes in reference for outcome in outcomes if not isinstance(outcome[1], int) or outcome[1] >= 500]
+        print(f"🔧 {args.items} scenarios, {requests} requests over {args.transport}; "
+              f"{len(errors)} server errors in the reference run", file=sys.stderr)
+        if errors:
+            failed = True
+            print(f"   first: {errors[0]}", file=sys.stderr)
+
+        baseline = None
+        for threads in thread_counts:
+            results, elapsed, reloads = run(transport, workload, threads, args.reload_interval)
+            throughput = requests / elapsed
+            baseline = baseline or throughput
+            wrong = mismatches(reference, results, workload)
+            failed = failed or bool(wrong)
+            print(
+                f"  {threads:3d} threads | {elapsed:7.2f} s | {throughput:8.1f} req/s | x{throughput / baseline:5.2f} | "
+                f"{reloads:4d} reloads | {'✅ identical' if not wrong else f'❌ {len(wrong)} scenarios differ'}",
+                file=sys.stderr,
+            )
+            for item, expected, got in wrong[:3]:
+                print(f"    {item[0]} [{item[1]}] seed {item[2]}: {describe(expected, got)}", file=sys.stderr)
+
+    backend.render_pool.shutdown()
+    sys.exit(1 if failed else 0)
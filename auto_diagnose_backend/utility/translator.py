@@ -1,34 +1,214 @@
-import json
+import argparse
 import asyncio
-from googletrans import Translator
+import json
+import os
+import random
+import sys
+
+# Allow running as `python utility/translator.py` from the backend folder
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from catalog import QUESTIONS_PATH, validate_questions
+
+# Source text -> translation per target language, kept between runs so only new
+# or changed strings are sent to the translation service
+MEMORY_PATH = os.path.join(BACKEND_DIR, "questions", "translation_memory.json")
+
+
+# ---------------------------------------------------------------------------
+# Backends: anything with `async translate(text, src, dest)` returning a str
+# ---------------------------------------------------------------------------
+
+# Google Translate through googletrans (pip install googletrans)
+class GoogleBackend:
+    def __init__(self):
+        try:
+            from googletrans import Translator
+        except ImportError:
+            sys.exit("❌ The google backend needs the googletrans package (pip install googletrans)")
+        self.translator = Translator()
+
+    async def translate(self, text, src, dest):
+        translation = await self.translator.translate(text, src=src, dest=dest)
+        return translation.text
+
+
+# Offline backend for trying the pipeline: tags the text with the target
+# language, and can add latency and random failures to exercise the retries
+class StubBackend:
+    def __init__(self, delay=0.0, failure_rate=0.0, seed=None):
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def translate(self, text, src, dest):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError("stub backend failure")
+        return f"[{dest}] {text}"
+
+
+BACKENDS = {"google": GoogleBackend, "stub": StubBackend}
+
+
+# ---------------------------------------------------------------------------
+# Translation memory
+# ---------------------------------------------------------------------------
+
+class TranslationMemory:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, src, dest, text):
+        return self.entries.get(f"{src}>{dest}", {}).get(text)
+
+    def put(self, src, dest, text, translation):
+        self.entries.setdefault(f"{src}>{dest}", {})[text] = translation
+
+    # Source texts each translation was made from, to spot translations left
+    # behind when the source text was edited
+    def sources_by_translation(self, src, dest):
+        sources = {}
+        for text, translation in self.entries.get(f"{src}>{dest}", {}).items():
+            sources.setdefault(translation, set()).add(text)
+        return sources
+
+    def save(self):
+        if self.path:
+            write_json(self.path, self.entries, sort_keys=True)
+
+
+def write_json(path, data, sort_keys=False):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+    os.replace(temp_path, path)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+# Every localized field of the question bank: {lang: text} dicts
+def localized_fields(questions):
+    for q in questions:
+        yield q["category"]
+        yield q["text"]
+        for option in q["options"]:
+            yield option["text"]
+            yield option["recommendation"]
+
+
+# Fill the memory with the translations already in the bank, and list the
+# fields that need a new one: missing, or made from a source text that changed
+def plan(questions, memory, src, dest, retranslate=False):
+    stale_sources = memory.sources_by_translation(src, dest)
+    pending = []
+    for field in localized_fields(questions):
+        text, current = field[src], field.get(dest)
+        if current is None or retranslate:
+            pending.append(field)
+        elif text not in stale_sources.get(current, (text,)):
+            pending.append(field)
+        elif memory.get(src, dest, text) is None:
+            memory.put(src, dest, text, current)
+    return pending
+
+
+async def translate_with_retry(backend, semaphore, text, src, dest, retries, backoff):
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                return await backend.translate(text, src, dest)
+            except Exception as e:
+                if attempt == retries:
+                    print(f"⚠️ Translation failed for '{text}' ({dest}): {e}")
+                    return None
+        # Exponential backoff with jitter, outside the semaphore so others can proceed
+        await asyncio.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+# Translate the distinct texts missing from the memory; returns how many were sent and failed
+async def translate_missing(backend, memory, texts, src, dest, concurrency, retries, backoff):
+    missing = sorted({text for text in texts if memory.get(src, dest, text) is None})
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(
+        translate_with_retry(backend, semaphore, text, src, dest, retries, backoff) for text in missing
+    ))
+    failed = 0
+    for text, translation in zip(missing, results):
+        if translation is None:
+            failed += 1
+        else:
+            memory.put(src, dest, text, translation)
+    return len(missing), failed
+
 
-# Initialize Translator
-translator = Translator()
+async def run(args):
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    memory = TranslationMemory(args.memory)
+    backend = StubBackend(args.stub_delay, args.stub_failure_rate) if args.backend == "stub" else BACKENDS[args.backend]()
 
-async def translate_text(text, src="en", dest="pt"):
-    """Translates text asynchronously"""
-    translation = await translator.translate(text, src=src, dest=dest)
-    return translation.text
+    changed = False
+    failed = 0
+    try:
+        for dest in args.lang:
+            pending = plan(questions, memory, args.source, dest, args.retranslate)
+            if args.retranslate:
+                memory.entries.pop(f"{args.source}>{dest}", None)
+            texts = [field[args.source] for field in pending]
+            sent, lang_failed = await translate_missing(
+                backend, memory, texts, args.source, dest, args.concurrency, args.retries, args.backoff
+            )
+            failed += lang_failed
+            for field in pending:
+                translation = memory.get(args.source, dest, field[args.source])
+                if translation is not None and field.get(dest) != translation:
+                    field[dest] = translation
+                    changed = True
+            print(f"🌐 [{dest}] {len(pending)} fields to update, {len(set(texts))} distinct texts, "
+                  f"{sent} sent to the backend, {lang_failed} failed")
+    finally:
+        # Keep what was translated even if the run stops half way
+        memory.save()
 
-async def translate_questions():
-    """Loads and translates questions.json"""
-    with open("questions.json", "r", encoding="utf-8") as file:
-        questions = json.load(file)
+    if failed:
+        print(f"❌ {failed} texts could not be translated; questions.json was not changed. Run again to retry them.")
+        return 1
+    if not changed:
+        print("✅ Nothing to translate.")
+        return 0
 
-    # Translate each question and its options
-    for question in questions:
-        question["text"] = await translate_text(question["text"])
+    languages = [args.source] + [lang for lang in dict.fromkeys(lang for field in localized_fields(questions) for lang in field) if lang != args.source]
+    validate_questions(questions, languages)
+    write_json(args.questions, questions)
+    print(f"✅ {args.questions} updated with {', '.join(languages)}.")
+    return 0
 
-        # Translate options
-        for option in question["options"]:
-            option["text"] = await translate_text(option["text"])
-            option["recommendation"] = await translate_text(option["recommendation"])
 
-    # Save translated JSON file
-    with open("questions_pt.json", "w", encoding="utf-8") as file:
-        json.dump(questions, file, ensure_ascii=False, indent=4)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Translate the question bank into other languages")
+    parser.add_argument("--lang", action="append", required=True, help="target language code; repeat for several")
+    parser.add_argument("--source", default="en", help="language the texts are translated from")
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="question bank, updated in place")
+    parser.add_argument("--memory", default=MEMORY_PATH, help="translation memory file (empty to disable)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="google")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--retries", type=int, default=4, help="retries per text after the first attempt")
+    parser.add_argument("--backoff", type=float, default=0.5, help="seconds before the first retry, doubling after that")
+    parser.add_argument("--retranslate", action="store_true", help="ignore existing translations and the memory")
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="seconds per call of the stub backend")
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0, help="fraction of stub calls that fail")
+    return parser.parse_args()
 
-    print("Translation completed! The translated file is saved as 'questions_pt.json'.")
 
-# Run the async translation function
-asyncio.run(translate_questions())
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -0,0 +1,49 @@
+import os
+import random
+import sys
+
+# Allow running as `python utility/verify_scoring_engine.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QUESTIONS_RELOAD_INTERVAL", "0")
+
+import backend
+from scoring_engine import engine_for
+
+RESPONDENTS = int(os.environ.get("VERIFY_RESPONDENTS", "2000"))
+
+
+# Random answer sets, with some unknown answers that must score 0
+def random_answer_sets(questions, count, rng):
+    return [
+        [rng.choice(q["options"])["text"] if rng.random() > 0.05 else "Unknown answer" for q in questions.questions]
+        for _ in range(count)
+    ]
+
+
+# Compare the vectorized engine with the per-request scoring path, field by field
+def verify(lang, count, rng):
+    questions = backend.catalog.language(lang)
+    answer_sets = random_answer_sets(questions, count, rng)
+    cohort = engine_for(questions).score(answer_sets)
+
+    mismatches = 0
+    for row, answers in enumerate(answer_sets):
+        expected, weak_areas, _ = backend.score_answers(questions, answers, lang)
+        vectorized = cohort.row(row)
+        vectorized["category_max_scores"] = questions.category_max_scores
+        vectorized["recommendations"] = backend.recommendation_message(cohort.weak_categories(row), lang)
+        if vectorized != expected or cohort.weak_categories(row) != weak_areas:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"Mismatch for respondent {row} ({lang}):\n  expected   {expected}\n  vectorized {vectorized}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    failed = False
+    for lang in backend.catalog.languages:
+        mismatches = verify(lang, RESPONDENTS, rng)
+        print(f"[{lang}] {RESPONDENTS} respondents, {mismatches} mismatches")
+        failed = failed or mismatches > 0
+    sys.exit(1 if failed else 0)